@@ -0,0 +1,114 @@
+"""
+Benchmark CPU : synthèse F5-TTS en mode eager vs. mode compilé (torch.compile + buckets).
+
+Mesure, pour plusieurs longueurs de texte, la latence du premier appel (compilation ou
+chargement depuis le cache disque) puis la latence en régime établi, et vérifie la parité
+avec le mode eager : le premier appel de chaque mode part de la même graine, et les formes
+d'onde doivent avoir la même durée et un écart absolu max inférieur à --tolerance sur toute
+leur longueur. Le script se termine en erreur (code 1) sinon.
+
+Usage (dans le container worker, depuis /app) :
+    python bench_compile.py voice_xxx.wav "transcription exacte de la référence" [--runs 3] [--nfe 32] [--tolerance 0.01]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Benchmark CPU : on masque le GPU avant l'import de torch.
+# Les modèles sont chargés en eager puis compilés explicitement ci-dessous.
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+os.environ["TTS_COMPILE"] = "0"
+
+import torch
+import torchaudio
+
+from services.compile import compile_dit, compile_vocoder
+from services.tts import tts_service
+
+SENTENCE = "Le rendez-vous est confirmé pour mardi prochain à quatorze heures trente. "
+TEXT_LENGTHS = [60, 180, 400]
+
+
+def make_text(length: int) -> str:
+    text = SENTENCE * (length // len(SENTENCE) + 1)
+    return text[:length].rsplit(" ", 1)[0] + "."
+
+
+def run(model, vocoder, text, ref_audio, ref_text, nfe, workdir, name="out.wav") -> float:
+    output = os.path.join(workdir, name)
+    start = time.perf_counter()
+    tts_service._run_inference(model, vocoder, tts_service._clean_text(text), output,
+                               ref_audio, ref_text, False, tts_service.default_speed, nfe)
+    return time.perf_counter() - start
+
+
+def measure(label, model, vocoder, args, workdir) -> dict:
+    results = {}
+    for length in TEXT_LENGTHS:
+        text = make_text(length)
+        # Premier appel à graine fixe : sa sortie sert à la comparaison eager / compilé
+        torch.manual_seed(0)
+        first = run(model, vocoder, text, args.reference, args.ref_text, args.nfe, workdir, f"{label}_{length}.wav")
+        steady = [run(model, vocoder, text, args.reference, args.ref_text, args.nfe, workdir) for _ in range(args.runs)]
+        results[length] = (first, sum(steady) / len(steady))
+        print(f"{label:<9} | {length:>4} chars | first call {first:7.2f}s | steady {results[length][1]:7.2f}s")
+    return results
+
+
+def parity(workdir, length):
+    """
+    Écart entre les sorties eager et compilée (même graine) sur toute la forme d'onde.
+    Renvoie (écart absolu max, durée eager, durée compilée) ; l'écart est infini si les durées diffèrent.
+    """
+    eager, sr = torchaudio.load(os.path.join(workdir, f"eager_{length}.wav"))
+    compiled, _ = torchaudio.load(os.path.join(workdir, f"compiled_{length}.wav"))
+    if eager.shape != compiled.shape:
+        max_diff = float("inf")
+    else:
+        max_diff = (eager - compiled).abs().max().item()
+    return max_diff, eager.shape[-1] / sr, compiled.shape[-1] / sr
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("reference")
+    parser.add_argument("ref_text")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--nfe", type=int, default=32)
+    parser.add_argument("--tolerance", type=float, default=1e-2,
+                        help="écart absolu max toléré entre les formes d'onde eager et compilée")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_compile_")
+    try:
+        model = tts_service._load_dit()
+        vocoder = tts_service._load_vocoder()
+        print(f"Device: {tts_service.device} | NFE: {args.nfe} | runs: {args.runs}")
+
+        eager = measure("eager", model, vocoder, args, workdir)
+        compiled = measure("compiled", compile_dit(model), compile_vocoder(vocoder), args, workdir)
+
+        print()
+        failed = []
+        for length in TEXT_LENGTHS:
+            speedup = eager[length][1] / compiled[length][1]
+            max_diff, eager_duration, compiled_duration = parity(workdir, length)
+            status = "OK" if max_diff <= args.tolerance else "MISMATCH"
+            if status != "OK":
+                failed.append(length)
+            print(f"{length:>4} chars | eager {eager[length][1]:6.2f}s | compiled {compiled[length][1]:6.2f}s | "
+                  f"x{speedup:.2f} | max|diff| {max_diff:.4f} | duration {eager_duration:.2f}s / "
+                  f"{compiled_duration:.2f}s | {status}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failed:
+        print(f"Parity check failed for {failed} chars (tolerance {args.tolerance})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark : latence de synthèse F5-TTS avec une référence longue vs. la même référence découpée.
+
+Usage (dans le container worker, depuis /app) :
+    python bench_ref_trim.py chemin/vers/reference_longue.wav [--target 10] [--runs 3]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import torchaudio
+import whisper
+
+from services.reference import trim_reference
+from services.tts import tts_service
+
+PROBE_TEXTS = [
+    "Bonjour, bienvenue dans notre service client.",
+    "Pour toute question concernant votre commande, appuyez sur la touche un.",
+    "Le rendez-vous est confirmé pour mardi prochain à quatorze heures trente.",
+]
+
+
+def measure(ref_path: str, ref_text: str, runs: int, workdir: str) -> float:
+    """
+    Latence moyenne (s) d'une synthèse sur l'ensemble des textes de test.
+    """
+    timings = []
+    for run in range(runs):
+        for i, text in enumerate(PROBE_TEXTS):
+            output = os.path.join(workdir, f"out_{run}_{i}.wav")
+            start = time.perf_counter()
+            tts_service.synthesize(text, output, ref_audio_path=ref_path, ref_text=ref_text)
+            timings.append(time.perf_counter() - start)
+    return sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("reference")
+    parser.add_argument("--target", type=float, default=10.0)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_ref_")
+    try:
+        # Même préparation que /transcribe : 24kHz mono
+        full_path = os.path.join(workdir, "full.wav")
+        os.system(f"ffmpeg -y -i {args.reference} -ar 24000 -ac 1 {full_path} > /dev/null 2>&1")
+        info = torchaudio.info(full_path)
+        full_duration = info.num_frames / info.sample_rate
+
+        model = whisper.load_model("base")
+        transcription = model.transcribe(full_path, language="fr", word_timestamps=True)
+
+        trimmed_path = os.path.join(workdir, "trimmed.wav")
+        shutil.copy2(full_path, trimmed_path)
+        trimmed = trim_reference(trimmed_path, transcription, args.target)
+        if not trimmed:
+            print(f"Reference ({full_duration:.1f}s) is not longer than target ({args.target}s): nothing to compare.")
+            return
+        trimmed_duration, trimmed_text = trimmed
+
+        # Préchauffage (chargement des modèles, caches CUDA)
+        tts_service.synthesize(PROBE_TEXTS[0], os.path.join(workdir, "warmup.wav"),
+                               ref_audio_path=trimmed_path, ref_text=trimmed_text)
+
+        full_latency = measure(full_path, transcription["text"], args.runs, workdir)
+        trimmed_latency = measure(trimmed_path, trimmed_text, args.runs, workdir)
+
+        print(f"Device            : {tts_service.device}")
+        print(f"Reference (full)  : {full_duration:.1f}s -> {full_latency:.2f}s / synthesis")
+        print(f"Reference (trim)  : {trimmed_duration:.1f}s -> {trimmed_latency:.2f}s / synthesis")
+        print(f"Latency reduction : {100 * (1 - trimmed_latency / full_latency):.1f}%")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
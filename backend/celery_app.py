@@ -1,17 +1,20 @@
+import json
 import os
+import time
 from celery import Celery
 from loguru import logger
 
 
 # Configuration Redis
 REDIS_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+RESULT_URL = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
 
 # Initialisation de Celery
 # On le nomme 'tasks' pour correspondre au fichier tasks.py que nous allons créer
 celery = Celery(
     'tasks',
     broker=REDIS_URL,
-    backend=REDIS_URL
+    backend=RESULT_URL
 )
 
 # Configuration optionnelle
@@ -25,4 +28,62 @@ celery.conf.update(
     worker_prefetch_multiplier=1,
 )
 
+def broker_queue_depth(queue: str = "celery") -> int:
+    """
+    Nombre de tâches en attente dans la file du broker (non encore prises par un worker).
+    """
+    with celery.connection_or_acquire() as conn:
+        return conn.default_channel.queue_declare(queue=queue, passive=True).message_count
+
+# --- État du worker (monitoring /models) ---
+# Le worker publie l'état de son registre de modèles dans Redis (à chaque chargement/
+# déchargement et périodiquement) ; l'API le lit sans passer par la file des tâches.
+WORKER_STATUS_KEY = "worker:models_status"
+WORKER_STATUS_INTERVAL = float(os.getenv("WORKER_STATUS_INTERVAL", "30"))
+# Hors Redis (broker mémoire : worker dans le processus de l'API), l'état reste en mémoire
+_local_worker_status = {}
+_status_client = None
+
+def _redis_client():
+    global _status_client
+    if _status_client is None:
+        import redis
+        _status_client = redis.Redis.from_url(REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+    return _status_client
+
+def publish_worker_status(status: dict):
+    """
+    Publie l'état du worker, horodaté (`published_at`) : sert aussi de battement de cœur.
+    """
+    status = {**status, "published_at": time.time()}
+    if not REDIS_URL.startswith("redis"):
+        _local_worker_status["status"] = status
+        return
+    # Conservée au-delà de l'intervalle : un état ancien signale un worker arrêté (voir worker_status_age)
+    _redis_client().set(WORKER_STATUS_KEY, json.dumps(status), ex=86400)
+
+def read_worker_status():
+    """
+    Dernier état publié par le worker, ou None s'il n'a rien publié récemment.
+    """
+    if not REDIS_URL.startswith("redis"):
+        return _local_worker_status.get("status")
+    raw = _redis_client().get(WORKER_STATUS_KEY)
+    return json.loads(raw) if raw else None
+
+def worker_status_age(status: dict = None):
+    """
+    Secondes écoulées depuis la dernière publication du worker, ou None si le worker
+    n'a jamais publié (état inconnu). Au-delà de 3 intervalles, le worker est considéré perdu.
+    """
+    if status is None:
+        status = read_worker_status()
+    if not status or "published_at" not in status:
+        return None
+    return time.time() - status["published_at"]
+
+def worker_lost(status: dict = None) -> bool:
+    age = worker_status_age(status)
+    return age is not None and age > WORKER_STATUS_INTERVAL * 3
+
 logger.info(f"Celery | Configured with broker: {REDIS_URL}")
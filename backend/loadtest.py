@@ -0,0 +1,323 @@
+"""
+Générateur de charge : simule N utilisateurs du studio sur le parcours réel.
+
+Chaque client virtuel :
+  1. ouvre /ws/{client_id} (et écoute les notifications de statut),
+  2. envoie un enregistrement à /transcribe,
+  3. sauvegarde la voix (/voices),
+  4. appelle /synthesize plusieurs fois avec un mélange de moteurs et de longueurs de texte.
+
+Rapport : débit et latences p50/p95/p99 par endpoint, calculées sur les réponses réussies
+(les refus 429/503, très rapides, fausseraient les percentiles : ils sont comptés à part).
+
+Usage :
+    # Contre la stack docker-compose (API sur :8000)
+    python loadtest.py --url http://localhost:8000 --clients 10 --iterations 5
+
+    # Hors-ligne, sans Redis : API et worker Celery (-P solo) lancés dans ce processus
+    # sur le broker mémoire, moteur TTS et Whisper remplacés par des stubs
+    python loadtest.py --inprocess --clients 10 --iterations 5
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import wave
+from collections import defaultdict
+
+import httpx
+import websockets
+
+SENTENCE = ("Bonjour et bienvenue dans le studio, nous allons tester la synthèse vocale "
+            "avec des phrases de longueurs différentes pour mesurer la latence. ")
+
+
+def make_text(length: int) -> str:
+    """
+    Texte français d'environ `length` caractères.
+    """
+    text = SENTENCE * (length // len(SENTENCE) + 1)
+    return text[:length].rsplit(" ", 1)[0] + "."
+
+
+def make_recording(seconds: float = 6.0, sample_rate: int = 16000) -> bytes:
+    """
+    Enregistrement WAV synthétique (sons modulés, pas de silence) pour /transcribe.
+    """
+    frames = bytearray()
+    for n in range(int(seconds * sample_rate)):
+        t = n / sample_rate
+        envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 3 * t)
+        value = envelope * 0.3 * (math.sin(2 * math.pi * 220 * t) + 0.5 * math.sin(2 * math.pi * 330 * t))
+        frames += int(max(-1.0, min(1.0, value)) * 32767).to_bytes(2, "little", signed=True)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+def parse_mix(spec: str) -> dict:
+    """
+    "f5:0.7,basic:0.3" -> {"f5": 0.7, "basic": 0.3}
+    """
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition(":")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Stats:
+    """
+    Collecte des latences et statuts par endpoint.
+    """
+    def __init__(self):
+        # Latences par endpoint et par issue ("ok", "rejected", "error")
+        self.latencies = defaultdict(lambda: defaultdict(list))
+        self.ws_messages = 0
+
+    def record(self, endpoint: str, seconds: float, outcome: str):
+        self.latencies[endpoint][outcome].append(seconds)
+
+    @staticmethod
+    def percentile(values: list, q: float):
+        if not values:
+            return None
+        ordered = sorted(values)
+        index = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+        return round(ordered[index] * 1000, 1)
+
+    def report(self, elapsed: float) -> dict:
+        report = {"elapsed_seconds": round(elapsed, 2), "ws_messages": self.ws_messages, "endpoints": {}}
+        for endpoint, outcomes in sorted(self.latencies.items()):
+            ok, rejected = outcomes["ok"], outcomes["rejected"]
+            requests = sum(len(values) for values in outcomes.values())
+            report["endpoints"][endpoint] = {
+                "requests": requests,
+                "ok": len(ok),
+                "rejected": len(rejected),
+                "errors": len(outcomes["error"]),
+                "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else None,
+                # Percentiles sur les réponses réussies uniquement
+                "p50_ms": self.percentile(ok, 50),
+                "p95_ms": self.percentile(ok, 95),
+                "p99_ms": self.percentile(ok, 99),
+                "rejected_p50_ms": self.percentile(rejected, 50),
+            }
+        return report
+
+
+def classify(response: httpx.Response) -> str:
+    """
+    ok / rejected (429, 503 : backpressure) / error (HTTP ou {"error": ...} de l'API).
+    """
+    if response.status_code in (429, 503):
+        return "rejected"
+    if response.status_code >= 400:
+        return "error"
+    if response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+        if isinstance(body, dict) and body.get("error"):
+            return "error"
+    return "ok"
+
+
+async def timed(stats: Stats, endpoint: str, call):
+    start = time.perf_counter()
+    try:
+        response = await call
+        outcome = classify(response)
+    except httpx.HTTPError:
+        response, outcome = None, "error"
+    stats.record(endpoint, time.perf_counter() - start, outcome)
+    return response
+
+
+async def listen(ws, stats: Stats):
+    try:
+        async for _ in ws:
+            stats.ws_messages += 1
+    except websockets.ConnectionClosed:
+        pass
+
+
+async def simulate_client(index: int, args, http: httpx.AsyncClient, recording: bytes, mix: dict, stats: Stats):
+    """
+    Parcours complet d'un utilisateur du studio.
+    """
+    rng = random.Random(args.seed + index)
+    client_id = f"load_{index}_{uuid.uuid4().hex[:6]}"
+    ws_url = args.url.replace("http", "ws", 1) + f"/ws/{client_id}"
+
+    await asyncio.sleep(rng.uniform(0, args.ramp_up))
+
+    start = time.perf_counter()
+    ws = await websockets.connect(ws_url)
+    stats.record("ws_connect", time.perf_counter() - start, "ok")
+    listener = asyncio.create_task(listen(ws, stats))
+
+    try:
+        await timed(stats, "/transcribe", http.post(
+            "/transcribe", files={"file": ("recording.wav", recording, "audio/wav")}))
+
+        response = await timed(stats, "/voices", http.post("/voices", json={"name": f"Load {index}"}))
+        voice_id = None
+        if response is not None and classify(response) == "ok":
+            voice_id = response.json().get("id")
+
+        engines, weights = list(mix), list(mix.values())
+        for _ in range(args.iterations):
+            engine = rng.choices(engines, weights)[0]
+            text = make_text(rng.choice(args.text_lengths))
+            await timed(stats, f"/synthesize[{engine}]", http.post("/synthesize", json={
+                "text": text, "engine": engine, "voice_id": voice_id, "client_id": client_id,
+            }))
+            await asyncio.sleep(rng.uniform(0, args.think_time))
+    finally:
+        await ws.close()
+        listener.cancel()
+
+
+async def run_load(args) -> dict:
+    recording = make_recording()
+    mix = parse_mix(args.engines)
+    stats = Stats()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as http:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(simulate_client(i, args, http, recording, mix, stats) for i in range(args.clients)),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - start
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    for failure in failures:
+        print(f"Client failure: {failure!r}", file=sys.stderr)
+
+    report = stats.report(elapsed)
+    report["clients"] = args.clients
+    report["failed_clients"] = len(failures)
+    return report
+
+
+def start_inprocess_server(port: int, stub_seconds_per_char: float):
+    """
+    Lance l'API (thread uvicorn) et un worker Celery (thread, pool solo comme en production)
+    dans ce processus, sur le broker mémoire : pas de Redis. Comme en production, l'API ne fait
+    que mettre les tâches en file et les surveiller ; la synthèse (stub) tourne dans le worker.
+    TTS et Whisper sont remplacés par des stubs. Tout s'exécute dans un répertoire temporaire
+    pour ne pas toucher data.db ni les voix existantes.
+    Renvoie (serveur uvicorn, contexte du worker).
+    """
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, backend_dir)
+    os.chdir(tempfile.mkdtemp(prefix="loadtest_"))
+    os.environ["CELERY_BROKER_URL"] = "memory://"
+    os.environ["CELERY_RESULT_BACKEND"] = "cache+memory://"
+    os.environ["WHISPER_PRELOAD"] = "0"
+
+    import uvicorn
+    from celery.contrib.testing.worker import start_worker
+    import main
+    from celery_app import celery
+    from services.tts import tts_service
+
+    def stub_synthesize(engine, text, output_path, **kwargs):
+        time.sleep(stub_seconds_per_char * len(text))
+        with wave.open(output_path, "wb") as writer:
+            writer.setnchannels(1)
+            writer.setsampwidth(2)
+            writer.setframerate(24000)
+            writer.writeframes(b"\x00\x00" * 2400 * max(1, len(text) // 10))
+        return output_path
+
+    def stub_transcription(audio_path):
+        words, t = [], 0.0
+        for word in "ceci est un enregistrement de test pour la charge".split():
+            words.append({"word": f" {word}", "start": t, "end": t + 0.4, "probability": 0.95})
+            t += 0.5
+        return {"text": "Ceci est un enregistrement de test pour la charge.",
+                "segments": [{"words": words, "no_speech_prob": 0.0}]}
+
+    tts_service.synthesize_with_engine = stub_synthesize
+    main.process_transcription = stub_transcription
+
+    # Le transport mémoire scrute ses files toutes les secondes par défaut : on réduit
+    # l'intervalle pour ne pas ajouter jusqu'à 1s de latence artificielle par tâche.
+    celery.conf.broker_transport_options = {"polling_interval": 0.01}
+    worker = start_worker(celery, pool="solo", concurrency=1, perform_ping_check=False, loglevel="WARNING")
+    worker.__enter__()
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.1)
+    return server, worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the voice studio API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=3, help="/synthesize calls per client")
+    parser.add_argument("--engines", default="f5:0.7,basic:0.3", help="engine mix, e.g. f5:0.7,basic:0.3")
+    parser.add_argument("--text-lengths", type=lambda s: [int(x) for x in s.split(",")], default=[40, 200, 600])
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="seconds over which clients start")
+    parser.add_argument("--think-time", type=float, default=0.5, help="max pause between syntheses")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--inprocess", action="store_true", help="run the app and a worker in-process (memory broker, stub TTS)")
+    parser.add_argument("--port", type=int, default=8765, help="port for --inprocess")
+    parser.add_argument("--stub-seconds-per-char", type=float, default=0.0005)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    server = worker = None
+    if args.inprocess:
+        server, worker = start_inprocess_server(args.port, args.stub_seconds_per_char)
+        args.url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        report = asyncio.run(run_load(args))
+    finally:
+        if server:
+            server.should_exit = True
+        if worker:
+            worker.__exit__(None, None, None)
+
+    def cell(value):
+        return "-" if value is None else value
+
+    print(f"{'endpoint':<22}{'req':>6}{'ok':>6}{'429/503':>9}{'err':>6}{'ok rps':>8}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rej p50':>10}")
+    for endpoint, row in report["endpoints"].items():
+        print(f"{endpoint:<22}{row['requests']:>6}{row['ok']:>6}{row['rejected']:>9}{row['errors']:>6}"
+              f"{cell(row['throughput_rps']):>8}{cell(row['p50_ms']):>10}{cell(row['p95_ms']):>10}"
+              f"{cell(row['p99_ms']):>10}{cell(row['rejected_p50_ms']):>10}")
+    print("(percentiles over successful responses; 'rej p50' = median latency of 429/503 rejections)")
+    print(f"clients: {report['clients']} (failed: {report['failed_clients']}) | "
+          f"elapsed: {report['elapsed_seconds']}s | ws messages: {report['ws_messages']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    main()
@@ -1,7 +1,6 @@
 from fastapi import FastAPI, UploadFile, File, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.concurrency import run_in_threadpool # Pour exécuter les tâches lourdes sans bloquer
-import whisper
 import sys
 from loguru import logger
 import torch # Import de torch pour vérifier CUDA
@@ -14,15 +13,30 @@ logger.remove()
 logger.add(sys.stderr, format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>")
 
 from services.tts import tts_service
-from tasks import synthesize_task # Nouveau : Import de la tâche Celery
+from services.model_registry import model_registry
+from services import stt
+from services.reference import trim_reference, REF_TARGET_DURATION
+from services.admission import AdmissionController, AdmissionRejected
+from services.profiling import should_profile, profile_trace, trace_path
+from torch.profiler import record_function
+from services.ingest import (
+    UploadRejected, UPLOAD_MAX_SECONDS, check_content_length, parse_pcm_content_type,
+    safe_extension, spool_stream, iter_upload, read_upload, validate_audio,
+)
+from celery_app import broker_queue_depth, read_worker_status, worker_lost
+from tasks import synthesize_task, bulk_synthesize_task, tune_voice_task # Nouveau : Import de la tâche Celery
 from celery.result import AsyncResult
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 import uuid
 import os
 import shutil
 import asyncio
+import time
 import sqlite3
 import shutil
+import csv
+import io
+import json
 
 app = FastAPI()
 
@@ -52,6 +66,70 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+# --- Contrôle d'admission (backpressure) ---
+# Refuse tôt le travail en excès (429/503 + Retry-After) plutôt que de le laisser
+# s'empiler dans Redis et dans des connexions HTTP ouvertes.
+admission = AdmissionController.from_env(queue_depth_probe=broker_queue_depth)
+
+# Tâches de suivi des jobs worker (lots, tuning) : l'event loop ne garde qu'une
+# référence faible sur les tâches, on les conserve ici jusqu'à leur fin.
+background_jobs = set()
+
+def spawn_background(coro):
+    task = asyncio.create_task(coro)
+    background_jobs.add(task)
+    task.add_done_callback(background_jobs.discard)
+    return task
+
+# Attente maximale d'un job worker avant de libérer son jeton d'admission
+SYNTHESIZE_TIMEOUT = float(os.getenv("SYNTHESIZE_TIMEOUT", "1800"))
+WORKER_JOB_TIMEOUT = float(os.getenv("WORKER_JOB_TIMEOUT", "14400"))
+
+class JobLost(Exception):
+    """
+    Levée quand un job worker ne se terminera pas : délai dépassé ou worker arrêté en cours de job.
+    """
+
+class JobMonitor:
+    """
+    Surveille un job Celery en cours d'attente : délai maximal, et détection d'un worker
+    qui ne publie plus son état (arrêt, crash) alors que le job a démarré. Sans cela, un job
+    perdu ne serait jamais "ready" et son jeton d'admission ne serait jamais rendu.
+    """
+    # Période (s) de vérification du battement de cœur du worker
+    HEARTBEAT_CHECK_INTERVAL = 15.0
+
+    def __init__(self, task, timeout: float):
+        self.task = task
+        self.deadline = time.monotonic() + timeout
+        self.next_check = time.monotonic() + self.HEARTBEAT_CHECK_INTERVAL
+
+    async def check(self):
+        now = time.monotonic()
+        if now > self.deadline:
+            self.task.revoke()
+            raise JobLost("Délai d'exécution dépassé.")
+        if now < self.next_check:
+            return
+        self.next_check = now + self.HEARTBEAT_CHECK_INTERVAL
+        # PENDING : encore en file, il sera traité au redémarrage du worker
+        if self.task.state == "PENDING":
+            return
+        try:
+            lost = await run_in_threadpool(worker_lost)
+        except Exception as e:
+            logger.warning(f"Jobs | Worker heartbeat unavailable: {e}")
+            return
+        if lost:
+            raise JobLost("Le worker s'est arrêté pendant le traitement.")
+
+def rejection_response(e: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        status_code=e.status_code,
+        content={"error": e.reason, "retry_after": e.retry_after},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     await manager.connect(websocket, client_id)
@@ -77,6 +155,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lisible par le navigateur : identifiant de la trace d'une synthèse profilée
+    expose_headers=["X-Profile-Id"],
 )
 
 import sqlite3
@@ -112,6 +192,13 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
+
+    # Migration : NFE par voix (tuning d'intelligibilité), absent des anciennes bases
+    columns = [r[1] for r in cursor.execute('PRAGMA table_info(voice_profiles)').fetchall()]
+    if 'nfe' not in columns:
+        cursor.execute('ALTER TABLE voice_profiles ADD COLUMN nfe INTEGER')
+    if 'tuned_at' not in columns:
+        cursor.execute('ALTER TABLE voice_profiles ADD COLUMN tuned_at TIMESTAMP')
     
     conn.commit()
     conn.close()
@@ -119,11 +206,14 @@ def init_db():
 # Appel de l'initialisation au démarrage du script
 init_db()
 
-# Chargement du modèle Whisper
-# On utilise le modèle "base" qui offre un bon compromis vitesse/précision.
-logger.info("Loading Whisper model...")
-model = whisper.load_model("base")
-logger.success("Whisper model loaded!")
+# Chargement du modèle Whisper (voir services/stt.py)
+# Le modèle est géré par le registre : préchargé au démarrage (sauf WHISPER_PRELOAD=0),
+# il peut être déchargé après inactivité (MODEL_IDLE_TIMEOUT) et rechargé à la demande.
+if os.getenv("WHISPER_PRELOAD", "1") == "1":
+    logger.info("Loading Whisper model...")
+    with model_registry.acquire("whisper"):
+        pass
+    logger.success("Whisper model loaded!")
 
 # Variables globales pour garder en mémoire la dernière référence vocale
 # Cela permet d'utiliser la voix de la dernière personne qui a parlé pour le TTS (clonage de voix).
@@ -140,7 +230,8 @@ def process_audio_cleaning(input_path: str, output_path: str) -> bool:
     """
     logger.info("Preprocessing | Cleaning audio (HighPass + Silence Removal)...")
     ffmpeg_cmd = (
-        f"ffmpeg -y -i {input_path} "
+        # -t borne le décodage même si le conteneur n'annonce pas sa durée (webm de MediaRecorder)
+        f"ffmpeg -y -t {UPLOAD_MAX_SECONDS} -i {input_path} "
         # Relaxed cleaning: reduced highpass and less aggressive silence removal
         f"-af \"highpass=f=100, silenceremove=start_periods=1:stop_periods=-1:start_threshold=-60dB:stop_threshold=-60dB:stop_duration=1.0\" "
         f"{output_path} > /dev/null 2>&1"
@@ -148,12 +239,13 @@ def process_audio_cleaning(input_path: str, output_path: str) -> bool:
     exit_code = os.system(ffmpeg_cmd)
     return exit_code == 0 and os.path.exists(output_path)
 
-def process_transcription(audio_path: str) -> str:
+def process_transcription(audio_path: str) -> dict:
     """
     Exécute la transcription Whisper (lourd CPU/GPU).
+    Renvoie le résultat complet (texte + segments avec horodatage des mots),
+    utilisé pour découper la référence vocale sur une frontière de mot.
     """
-    result = model.transcribe(audio_path, language="fr")
-    return result["text"]
+    return stt.transcribe(audio_path, word_timestamps=True)
 
 def process_voice_ref_conversion(input_path: str, output_path: str):
     """
@@ -161,67 +253,178 @@ def process_voice_ref_conversion(input_path: str, output_path: str):
     """
     os.system(f"ffmpeg -y -i {input_path} -ar 24000 -ac 1 {output_path} > /dev/null 2>&1")
 
-@app.post("/transcribe")
-async def transcribe_audio(file: UploadFile = File(...)):
+def process_transcribe_pipeline(temp_path: str, cleaned_path: str, profile_id: str = None) -> dict:
     """
-    Endpoint pour transcrire un fichier audio envoyé par le client.
-    Optimisé avec run_in_threadpool pour ne pas bloquer l'event loop.
+    Pipeline bloquant de /transcribe : nettoyage FFmpeg, transcription Whisper,
+    préparation (et découpage) de la référence vocale.
+    Si `profile_id` est fourni, le pipeline est capturé dans une trace Chrome.
     """
-    global last_audio_path, last_audio_text, last_cleaned_path
-    
-    # Création d'un nom de fichier temporaire unique
-    temp_path = f"temp_{uuid.uuid4()}_{file.filename}"
-    cleaned_path = f"cleaned_{uuid.uuid4()}.wav"
-    
-    # Écriture du fichier reçu sur le disque (IO bound, mais rapide en local, on garde en async)
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    try:
-        # 1. Nettoyage audio (BLOQUANT -> THREAD)
-        cleaning_success = await run_in_threadpool(process_audio_cleaning, temp_path, cleaned_path)
-        
+    result = {"cleaned_available": False, "ref_path": None}
+    with profile_trace(profile_id, enabled=profile_id is not None) as trace:
+        # 1. Nettoyage audio
+        with record_function("transcribe.ffmpeg_cleaning"):
+            cleaning_success = process_audio_cleaning(temp_path, cleaned_path)
+
         # Si le nettoyage a échoué (ex: fichier vide), on utilise l'original
         final_input = cleaned_path if cleaning_success else temp_path
         if final_input == cleaned_path:
-             last_cleaned_path = os.path.abspath(cleaned_path)
-             logger.debug(f"Audio cleaning successful: {last_cleaned_path}")
+             result["cleaned_available"] = True
+             logger.debug(f"Audio cleaning successful: {os.path.abspath(cleaned_path)}")
+
+        # 2. Transcription Whisper
+        with record_function("transcribe.whisper"):
+            transcription = process_transcription(final_input)
+        text = transcription["text"]
+        result["text"] = text
 
-        # 2. Transcription Whisper (BLOQUANT -> THREAD)
-        text = await run_in_threadpool(process_transcription, final_input)
-        
         logger.info(f"STT Transcribed: {text}")
-        
-        # 3. Préparation référence vocale (BLOQUANT -> THREAD)
+
+        # 3. Préparation référence vocale
         ref_path = "last_voice_ref.wav"
         try:
-            await run_in_threadpool(process_voice_ref_conversion, final_input, ref_path)
-            
+            with record_function("transcribe.ref_conversion"):
+                process_voice_ref_conversion(final_input, ref_path)
+
             # Vérification de la durée (Qualité check)
             duration = 0.0
+            short = False
             try:
                 info = torchaudio.info(ref_path)
                 duration = info.num_frames / info.sample_rate
                 if duration < 3.0:
                     logger.warning(f"Voice reference is too short: {duration:.2f}s (Min recommended: 3s)")
-                    return {
-                        "transcript": text, 
-                        "cleaned_available": (final_input == cleaned_path),
-                        "warning": "L'enregistrement est trop court (< 3s). La qualité de la voix clonée risque d'être mauvaise. Veuillez parler plus longtemps."
-                    }
+                    result["warning"] = "L'enregistrement est trop court (< 3s). La qualité de la voix clonée risque d'être mauvaise. Veuillez parler plus longtemps."
+                    short = True
             except Exception as e:
                 logger.error(f"Failed to check audio duration: {e}")
 
-            last_audio_path = os.path.abspath(ref_path)
-            last_audio_text = text
-            logger.debug(f"Saved new voice reference: {last_audio_path} (Duration: {duration:.2f}s)")
+            if not short:
+                # Référence trop longue : on la coupe (audio + texte) sur le meilleur extrait
+                # pour borner la longueur de séquence du DiT à chaque synthèse.
+                ref_text = text
+                if duration > REF_TARGET_DURATION:
+                    try:
+                        with record_function("transcribe.ref_trim"):
+                            trimmed = trim_reference(ref_path, transcription)
+                        if trimmed:
+                            duration, ref_text = trimmed
+                            result["trimmed"] = trimmed
+                    except Exception as e:
+                        logger.error(f"Failed to trim voice reference: {e}")
+
+                result["ref_path"] = os.path.abspath(ref_path)
+                result["ref_text"] = ref_text
+                logger.debug(f"Saved new voice reference: {result['ref_path']} (Duration: {duration:.2f}s)")
         except Exception as e:
             logger.error(f"Error preparing voice ref: {e}")
 
-        return {"transcript": text, "cleaned_available": (final_input == cleaned_path)}
+    if trace.path:
+        result["profile_id"] = trace.profile_id
+    return result
+
+def profile_requested(request: Request, data: dict = None) -> bool:
+    """
+    Profilage demandé explicitement : en-tête `X-Profile: 1` ou flag `"profile": true` (ou ?profile=1).
+    """
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    if data is not None and data.get("profile") is not None:
+        flag = data.get("profile")
+    return str(flag).lower() in ("1", "true", "yes")
+
+async def ingest_upload(request: Request) -> str:
+    """
+    Spoole l'audio reçu sur disque, par blocs et sans bloquer l'event loop, puis vérifie
+    son en-tête (format, durée) avant tout décodage. Accepte :
+    - multipart/form-data (champ "file"), comme le frontend ;
+    - le corps brut (audio/webm, audio/wav, audio/mpeg...) ;
+    - du PCM brut 16 bits (audio/L16;rate=...;channels=... ou ?format=pcm_s16le).
+    Renvoie le chemin du fichier spoolé ; lève UploadRejected si l'upload est refusé.
+    """
+    content_type = request.headers.get("content-type", "")
+    query = dict(request.query_params)
+
+    if content_type.startswith("multipart/form-data"):
+        # Le parseur multipart lit tout le corps : on exige une taille annoncée et bornée
+        check_content_length(request.headers.get("content-length"), required=True)
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise UploadRejected(422, "No file provided")
+        try:
+            pcm = parse_pcm_content_type(upload.content_type or "", query)
+            path = await spool_stream(iter_upload(upload), safe_extension(upload.filename), pcm)
+        finally:
+            await form.close()
+    else:
+        check_content_length(request.headers.get("content-length"))
+        pcm = parse_pcm_content_type(content_type, query)
+        path = await spool_stream(request.stream(), safe_extension(query.get("filename")), pcm)
+
+    try:
+        await run_in_threadpool(validate_audio, path)
+    except BaseException:
+        # Quelle que soit l'erreur, l'appelant ne reçoit pas le chemin : on supprime le fichier ici
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return path
+
+@app.post("/transcribe")
+async def transcribe_audio(request: Request):
+    """
+    Endpoint pour transcrire un fichier audio envoyé par le client.
+    Optimisé avec run_in_threadpool pour ne pas bloquer l'event loop.
+    """
+    global last_audio_path, last_audio_text, last_cleaned_path
+
+    # Création d'un nom de fichier temporaire unique
+    temp_path = None
+    cleaned_path = f"cleaned_{uuid.uuid4()}.wav"
+    service_time = None
+    ticket = None
+    
+    try:
+        # 0. Ingestion en streaming + validation de l'en-tête (taille, format, durée)
+        # Avant l'admission : un upload lent n'occupe pas une place de transcription.
+        try:
+            temp_path = await ingest_upload(request)
+        except UploadRejected as e:
+            logger.warning(f"Ingest | Upload rejected ({e.status_code}): {e.reason}")
+            return JSONResponse(status_code=e.status_code, content={"error": e.reason})
+
+        try:
+            ticket = await run_in_threadpool(admission.admit, "transcribe")
+        except AdmissionRejected as e:
+            return rejection_response(e)
+
+        # 1-3. Nettoyage, transcription et préparation de la référence (BLOQUANT -> THREAD)
+        # Tout le pipeline s'exécute dans un seul thread pour pouvoir être profilé d'un bloc.
+        profile_id = str(uuid.uuid4()) if should_profile(profile_requested(request)) else None
+        started = time.perf_counter()
+        result = await run_in_threadpool(process_transcribe_pipeline, temp_path, cleaned_path, profile_id)
+        # Temps de service = pipeline seul (l'upload dépend du débit du client)
+        service_time = time.perf_counter() - started
+
+        if result["cleaned_available"]:
+            last_cleaned_path = os.path.abspath(cleaned_path)
+
+        response = {"transcript": result["text"], "cleaned_available": result["cleaned_available"]}
+        if result.get("warning"):
+            response["warning"] = result["warning"]
+        elif result.get("ref_path"):
+            last_audio_path = result["ref_path"]
+            last_audio_text = result["ref_text"]
+            if result.get("trimmed"):
+                duration, trimmed_text = result["trimmed"]
+                response["reference"] = {"duration": round(duration, 2), "text": trimmed_text}
+        if result.get("profile_id"):
+            response["profile_id"] = result["profile_id"]
+        return response
     finally:
+        if ticket:
+            admission.release(ticket, service_time)
         # Nettoyage : suppression du fichier temporaire reçu
-        if os.path.exists(temp_path):
+        if temp_path and os.path.exists(temp_path):
             os.remove(temp_path)
 
 @app.get("/listen_cleaned")
@@ -334,10 +537,10 @@ async def get_voices():
     """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    cursor.execute('SELECT id, name FROM voice_profiles ORDER BY created_at DESC')
+    cursor.execute('SELECT id, name, nfe FROM voice_profiles ORDER BY created_at DESC')
     rows = cursor.fetchall()
     conn.close()
-    return [{"id": r[0], "name": r[1]} for r in rows]
+    return [{"id": r[0], "name": r[1], "nfe": r[2]} for r in rows]
 
 @app.delete("/voices/{voice_id}")
 async def delete_voice(voice_id: str):
@@ -358,6 +561,56 @@ async def delete_voice(voice_id: str):
     conn.close()
     return {"status": "deleted"}
 
+def get_voice_reference(voice_id: str = None):
+    """
+    Renvoie (audio, texte, nfe) de référence : le profil vocal demandé,
+    ou à défaut la dernière voix enregistrée. `nfe` est le réglage issu du tuning (ou None).
+    """
+    ref_audio = last_audio_path
+    ref_text = last_audio_text
+    nfe = None
+
+    if voice_id:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('SELECT audio_path, ref_text, nfe FROM voice_profiles WHERE id = ?', (voice_id,))
+        row = cursor.fetchone()
+        conn.close()
+        if row:
+            ref_audio, ref_text, nfe = row[0], row[1], row[2]
+
+    return ref_audio, ref_text, nfe
+
+# Bornes du NFE accepté dans une requête (le DiT n'est pas utilisable en dessous, inutile au-delà)
+NFE_MIN = 8
+NFE_MAX = 128
+
+def parse_nfe(value, default):
+    """
+    NFE explicite de la requête, borné à [NFE_MIN, NFE_MAX] ; `default` (réglage par voix) s'il est absent.
+    Lève ValueError si la valeur n'est pas un entier.
+    """
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        raise ValueError(value)
+    return min(NFE_MAX, max(NFE_MIN, int(value)))
+
+def check_voice_reference(ref_audio: str, ref_text: str):
+    """
+    Vérifie qu'une référence utilisable existe pour le clonage F5.
+    Renvoie un message d'erreur, ou None si tout est correct.
+    """
+    if not ref_audio or not os.path.exists(ref_audio):
+        logger.error("Synthesis | No reference audio available for cloning")
+        return "Aucun enregistrement vocal disponible. Parlez d'abord ou téléchargez un fichier."
+
+    if not ref_text or len(ref_text.strip()) < 2:
+        logger.error(f"Synthesis | Reference text too short/empty: '{ref_text}'")
+        return "La transcription de votre voix est manquante ou trop courte. Réessayez l'enregistrement."
+
+    return None
+
 @app.post("/synthesize")
 async def synthesize_text(request: Request):
     """
@@ -383,39 +636,38 @@ async def synthesize_text(request: Request):
     output_path = f"output_{uuid.uuid4()}.wav"
     
     # Sélection de la voix (Logique simplifiée pour l'exemple)
-    ref_audio = last_audio_path
-    ref_text = last_audio_text
-    
-    if voice_id:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('SELECT audio_path, ref_text FROM voice_profiles WHERE id = ?', (voice_id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            ref_audio, ref_text = row[0], row[1]
+    ref_audio, ref_text, voice_nfe = get_voice_reference(voice_id)
+    # NFE explicite dans la requête, sinon réglage par voix (tuning), sinon défaut du service
+    try:
+        nfe = parse_nfe(data.get("nfe"), voice_nfe)
+    except (TypeError, ValueError):
+        return JSONResponse(status_code=422, content={"error": f"nfe must be an integer ({NFE_MIN}-{NFE_MAX})"})
 
     engine = data.get("engine", "f5")
     if use_basic: engine = "basic"
 
     # -- Safety Check for Reference --
     if engine == "f5" and not use_standard:
-        if not ref_audio or not os.path.exists(ref_audio):
-            logger.error("Synthesis | No reference audio available for cloning")
-            return {"error": "Aucun enregistrement vocal disponible. Parlez d'abord ou téléchargez un fichier."}
-        
-        if not ref_text or len(ref_text.strip()) < 2:
-            logger.error(f"Synthesis | Reference text too short/empty: '{ref_text}'")
-            return {"error": "La transcription de votre voix est manquante ou trop courte. Réessayez l'enregistrement."}
+        error = check_voice_reference(ref_audio, ref_text)
+        if error:
+            return {"error": error}
+
+    try:
+        ticket = await run_in_threadpool(admission.admit, engine)
+    except AdmissionRejected as e:
+        await notify_status(f"Erreur : {e.reason}")
+        return rejection_response(e)
 
+    service_time = None
     try:
         # --- DELEGATION A CELERY ---
         logger.info(f"Synthesis | Queuing task for engine: {engine}")
         await notify_status(f"Mise en file d'attente ({engine})...")
         
+        profile = should_profile(profile_requested(request, data))
         task = synthesize_task.delay(
             engine, text, os.path.abspath(output_path), 
-            ref_audio, ref_text, use_standard
+            ref_audio, ref_text, use_standard, profile, nfe
         )
         
         # --- SURVEILLANCE DE LA TACHE (Status Relay) ---
@@ -423,7 +675,9 @@ async def synthesize_text(request: Request):
         # Dès que c'est fini, on renvoie le fichier.
         
         last_status = ""
+        monitor = JobMonitor(task, SYNTHESIZE_TIMEOUT)
         while not task.ready():
+            await monitor.check()
             # On récupère l'état 'meta' défini dans synthesize_task
             result = AsyncResult(task.id)
             if result.info and isinstance(result.info, dict):
@@ -442,7 +696,11 @@ async def synthesize_text(request: Request):
             if path and os.path.exists(path):
                 logger.success(f"Synthesis | Worker success: {path}")
                 await notify_status("Synthèse terminée ! Envoi de l'audio...")
-                return FileResponse(path, media_type="audio/wav")
+                service_time = final_result.get('runtime')
+                headers = {}
+                if final_result.get('profile_id'):
+                    headers["X-Profile-Id"] = final_result['profile_id']
+                return FileResponse(path, media_type="audio/wav", headers=headers)
         
         error_msg = final_result.get('error', 'Unknown worker error')
         logger.error(f"Synthesis | Worker failure: {error_msg}")
@@ -453,6 +711,271 @@ async def synthesize_text(request: Request):
         logger.error(f"Synthesis | Gateway Error: {e}")
         await notify_status(f"Erreur : {str(e)}")
         return {"error": str(e)}
+    finally:
+        admission.release(ticket, service_time)
+
+# --- Synthèse en lot ---
+
+# Nombre maximum d'éléments acceptés par job de synthèse en lot
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "500"))
+# Taille maximale du fichier JSONL/CSV (ou du corps JSON) d'un lot
+BULK_MAX_BYTES = int(float(os.getenv("BULK_MAX_MB", "2")) * 1024 * 1024)
+BULK_OUTPUT_DIR = "bulk_outputs"
+
+def parse_bulk_upload(filename: str, content: bytes) -> list[str]:
+    """
+    Extrait la liste des textes d'un fichier JSONL ou CSV.
+    - JSONL : une chaîne JSON ou un objet {"text": ...} par ligne.
+    - CSV : colonne "text" si présente, sinon la première colonne.
+    """
+    raw = content.decode("utf-8-sig")
+    texts = []
+
+    if filename.lower().endswith(".csv"):
+        rows = list(csv.reader(io.StringIO(raw)))
+        if not rows:
+            return []
+        header = [h.strip().lower() for h in rows[0]]
+        if "text" in header:
+            column = header.index("text")
+            rows = rows[1:]
+        else:
+            column = 0
+        texts = [row[column] for row in rows if len(row) > column]
+    else:
+        for line in raw.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            texts.append(item.get("text", "") if isinstance(item, dict) else str(item))
+
+    return [t.strip() for t in texts if t and t.strip()]
+
+async def watch_worker_job(task_id: str, ticket, client_id: str = None):
+    """
+    Surveille un job worker (synthèse en lot, tuning) : relaie la progression vers le client
+    WebSocket (si fourni) et libère le jeton d'admission à la fin du job.
+    """
+    task = AsyncResult(task_id)
+    last_done = -1
+    service_time = None
+    monitor = JobMonitor(task, WORKER_JOB_TIMEOUT)
+    try:
+        while not task.ready():
+            await monitor.check()
+            if client_id and task.info and isinstance(task.info, dict):
+                done = task.info.get("done", 0)
+                if done != last_done:
+                    await manager.send_personal_message({"job_id": task_id, **task.info}, client_id)
+                    last_done = done
+            await asyncio.sleep(0.5)
+        result = task.get()
+        if result.get("status") == "Terminé":
+            service_time = result.get("runtime")
+        if client_id:
+            await manager.send_personal_message({"job_id": task_id, **result}, client_id)
+    except JobLost as e:
+        logger.error(f"Jobs | Job {task_id} abandoned: {e}")
+        if client_id:
+            await manager.send_personal_message({"job_id": task_id, "status": "Erreur", "error": str(e)}, client_id)
+    except Exception as e:
+        logger.error(f"Bulk Synthesis | Watcher error for {task_id}: {e}")
+    finally:
+        admission.release(ticket, service_time)
+
+@app.post("/synthesize/bulk")
+async def synthesize_bulk(request: Request):
+    """
+    Synthèse en lot avec une seule voix : liste de textes en JSON
+    ({"texts": [...], "voice_id": ...}) ou fichier JSONL/CSV en multipart (champ "file").
+    Tous les éléments sont traités dans un seul job Celery ; renvoie l'identifiant du job.
+    Options : "output" = "zip" (un fichier par élément) ou "concat" (une seule piste).
+    """
+    multipart = request.headers.get("content-type", "").startswith("multipart/form-data")
+    try:
+        # Même règle que /transcribe : le parseur multipart lit tout le corps, taille annoncée requise
+        check_content_length(request.headers.get("content-length"), required=multipart, max_bytes=BULK_MAX_BYTES)
+    except UploadRejected as e:
+        return JSONResponse(status_code=e.status_code, content={"error": e.reason})
+
+    if multipart:
+        form = await request.form()
+        try:
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                return {"error": "No file provided"}
+            try:
+                texts = parse_bulk_upload(upload.filename or "", await read_upload(upload, BULK_MAX_BYTES))
+            except UploadRejected as e:
+                return JSONResponse(status_code=e.status_code, content={"error": e.reason})
+            except (ValueError, UnicodeDecodeError) as e:
+                return {"error": f"Invalid bulk file: {e}"}
+            data = {k: v for k, v in form.items() if isinstance(v, str)}
+        finally:
+            await form.close()
+    else:
+        data = await request.json()
+        if not isinstance(data, dict):
+            return JSONResponse(status_code=422, content={"error": "Body must be a JSON object with a 'texts' list"})
+        texts = data.get("texts", [])
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            return JSONResponse(status_code=422, content={"error": "'texts' must be a list of strings"})
+        texts = [t.strip() for t in texts if t.strip()]
+
+    if not texts:
+        return {"error": "No text provided"}
+    if len(texts) > BULK_MAX_ITEMS:
+        return {"error": f"Too many items ({len(texts)} > {BULK_MAX_ITEMS})"}
+
+    engine = data.get("engine", "f5")
+    use_standard = str(data.get("use_standard", False)).lower() in ("1", "true")
+    output_format = data.get("output", "zip")
+    if output_format not in ("zip", "concat"):
+        return {"error": "output must be 'zip' or 'concat'"}
+
+    ref_audio, ref_text, voice_nfe = get_voice_reference(data.get("voice_id"))
+    try:
+        nfe = parse_nfe(data.get("nfe"), voice_nfe)
+    except (TypeError, ValueError):
+        return JSONResponse(status_code=422, content={"error": f"nfe must be an integer ({NFE_MIN}-{NFE_MAX})"})
+    if engine == "f5" and not use_standard:
+        error = check_voice_reference(ref_audio, ref_text)
+        if error:
+            return {"error": error}
+
+    # Un lot compte pour autant d'unités de travail que d'éléments
+    try:
+        ticket = await run_in_threadpool(admission.admit, engine, weight=len(texts))
+    except AdmissionRejected as e:
+        return rejection_response(e)
+
+    output_dir = os.path.abspath(os.path.join(BULK_OUTPUT_DIR, str(uuid.uuid4())))
+    try:
+        task = bulk_synthesize_task.delay(
+            engine, texts, output_dir,
+            ref_audio, ref_text, use_standard, output_format, nfe
+        )
+    except Exception as e:
+        admission.release(ticket)
+        logger.error(f"Bulk Synthesis | Gateway Error: {e}")
+        return {"error": str(e)}
+    logger.info(f"Bulk Synthesis | Queued job {task.id} ({len(texts)} items, {engine}, {output_format})")
+
+    spawn_background(watch_worker_job(task.id, ticket, data.get("client_id")))
+
+    return {"job_id": task.id, "total": len(texts)}
+
+@app.get("/synthesize/bulk/{job_id}")
+async def bulk_status(job_id: str):
+    """
+    Progression d'un job de synthèse en lot (éléments traités, échecs, statut).
+    """
+    task = AsyncResult(job_id)
+    if task.ready():
+        result = task.get()
+        return {"job_id": job_id, "state": "DONE", **result}
+    info = task.info if isinstance(task.info, dict) else {}
+    return {"job_id": job_id, "state": task.state, **info}
+
+@app.get("/synthesize/bulk/{job_id}/result")
+async def bulk_result(job_id: str):
+    """
+    Télécharge le résultat d'un job terminé (ZIP ou piste concaténée).
+    """
+    task = AsyncResult(job_id)
+    if not task.ready():
+        return {"error": "Job not finished yet"}
+
+    result = task.get()
+    path = result.get("path")
+    if result.get("status") != "Terminé" or not path or not os.path.exists(path):
+        return {"error": result.get("error", "No result available")}
+
+    if path.endswith(".zip"):
+        return FileResponse(path, media_type="application/zip", filename=f"bulk_{job_id}.zip")
+    return FileResponse(path, media_type="audio/wav", filename=f"bulk_{job_id}.wav")
+
+# --- Tuning NFE par voix ---
+
+@app.post("/voices/{voice_id}/tune")
+async def tune_voice(voice_id: str):
+    """
+    Lance le tuning NFE d'un profil vocal sur le worker : les phrases de test sont
+    synthétisées à NFE décroissant et notées par Whisper (WER). Le NFE le moins cher
+    qui reste intelligible est enregistré sur le profil et utilisé par défaut ensuite.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT audio_path, ref_text FROM voice_profiles WHERE id = ?', (voice_id,))
+    row = cursor.fetchone()
+    conn.close()
+    if not row:
+        return JSONResponse(status_code=404, content={"error": "Voice not found"})
+
+    ref_audio, ref_text = row
+    error = check_voice_reference(ref_audio, ref_text)
+    if error:
+        return {"error": error}
+
+    # Limite dédiée (ADMISSION_MAX_PENDING_TUNE) : un tuning ne réserve pas toute la capacité F5
+    try:
+        ticket = await run_in_threadpool(admission.admit, "tune")
+    except AdmissionRejected as e:
+        return rejection_response(e)
+
+    workdir = os.path.abspath(os.path.join("tuning", voice_id))
+    task = tune_voice_task.delay(voice_id, ref_audio, ref_text, os.path.abspath(DB_PATH), workdir)
+    spawn_background(watch_worker_job(task.id, ticket))
+    logger.info(f"Voice Tuning | Queued job {task.id} for voice {voice_id}")
+    return {"job_id": task.id}
+
+@app.get("/voices/tune/{job_id}")
+async def tune_status(job_id: str):
+    """
+    Progression / résultat d'un tuning NFE (WER par NFE testé, NFE retenu).
+    """
+    task = AsyncResult(job_id)
+    if task.ready():
+        return {"job_id": job_id, "state": "DONE", **task.get()}
+    info = task.info if isinstance(task.info, dict) else {}
+    return {"job_id": job_id, "state": task.state, **info}
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """
+    Télécharge la trace Chrome d'une requête profilée (chrome://tracing, ui.perfetto.dev).
+    L'identifiant est renvoyé dans l'en-tête X-Profile-Id (/synthesize) ou le champ profile_id (/transcribe).
+    """
+    path = trace_path(profile_id)
+    if not path or not os.path.exists(path):
+        return JSONResponse(status_code=404, content={"error": "Profile not found"})
+    return FileResponse(path, media_type="application/json", filename=f"trace_{profile_id}.json")
+
+@app.get("/load")
+async def get_load():
+    """
+    Charge courante par moteur (travail en attente, capacité, attente estimée)
+    et profondeur de la file Celery. Utilisable par les clients et comme signal d'autoscaling.
+    """
+    return await run_in_threadpool(admission.snapshot)
+
+@app.get("/models")
+async def get_models():
+    """
+    Monitoring des modèles résidents (API et worker) : empreinte mémoire,
+    utilisation et derniers événements de chargement/déchargement.
+    """
+    worker = None
+    try:
+        # État publié par le worker dans Redis (aucune tâche mise en file par le monitoring)
+        worker = await run_in_threadpool(read_worker_status)
+        if worker:
+            worker["stale"] = worker_lost(worker)
+    except Exception as e:
+        logger.warning(f"Models | Worker status unavailable: {e}")
+
+    return {"api": model_registry.snapshot(), "worker": worker}
 
 @app.get("/")
 def read_root():
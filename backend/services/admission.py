@@ -0,0 +1,189 @@
+import math
+import os
+import threading
+import time
+
+from loguru import logger
+
+
+class AdmissionRejected(Exception):
+    """
+    Levée quand une requête est refusée par le contrôle d'admission.
+    `status_code` vaut 429 (limite du moteur atteinte) ou 503 (file globale saturée).
+    """
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _EngineState:
+    """
+    Compteurs d'un moteur : travail en cours, limite, capacité et temps de service moyen.
+    """
+    def __init__(self, max_pending: int, capacity: int, default_service_time: float):
+        self.max_pending = max_pending
+        self.capacity = max(1, capacity)
+        self.pending = 0
+        self.avg_service_time = default_service_time
+        self.admitted = 0
+        self.rejected = 0
+
+
+class Ticket:
+    """
+    Jeton d'admission : doit être rendu via `AdmissionController.release()` à la fin du travail.
+    """
+    def __init__(self, engine: str, weight: int):
+        self.engine = engine
+        self.weight = weight
+        self.released = False
+
+
+class AdmissionController:
+    """
+    Contrôle d'admission et backpressure pour /synthesize, /synthesize/bulk et /transcribe.
+
+    Chaque moteur a une limite de travail en attente (MAX_PENDING) et une capacité
+    (nombre de jobs traités en parallèle). Au-delà de la limite, la requête est refusée
+    tout de suite (429 + Retry-After) au lieu de s'empiler dans Redis et dans des
+    connexions HTTP ouvertes. Si la file Celery globale dépasse ADMISSION_MAX_QUEUE,
+    on renvoie 503. Le temps de service moyen (EWMA, mesuré par le worker hors attente
+    en file) sert à estimer l'attente.
+    """
+    # Poids de la dernière mesure dans la moyenne glissante du temps de service
+    EWMA_ALPHA = 0.2
+    # Durée de validité (s) de la profondeur de file mesurée (une requête broker par seconde au plus)
+    QUEUE_DEPTH_TTL = 1.0
+
+    def __init__(self, engines: dict, max_queue: int = 0, queue_depth_probe=None):
+        self._engines = engines
+        self.max_queue = max_queue
+        self._queue_depth_probe = queue_depth_probe
+        self._queue_depth = (0.0, None)  # (mesuré à, profondeur)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, queue_depth_probe=None):
+        """
+        Limites configurables par moteur :
+        ADMISSION_MAX_PENDING_<MOTEUR> (0 = illimité), ADMISSION_CAPACITY_<MOTEUR>,
+        et ADMISSION_MAX_QUEUE pour la profondeur de la file Celery (0 = pas de limite).
+        """
+        def engine(name: str, max_pending: int, capacity: int, service_time: float):
+            key = name.upper()
+            return _EngineState(
+                max_pending=int(os.getenv(f"ADMISSION_MAX_PENDING_{key}", str(max_pending))),
+                capacity=int(os.getenv(f"ADMISSION_CAPACITY_{key}", str(capacity))),
+                default_service_time=service_time,
+            )
+
+        return cls(
+            engines={
+                "f5": engine("f5", 8, 1, 20.0),
+                "basic": engine("basic", 32, 1, 2.0),
+                "transcribe": engine("transcribe", 4, 1, 5.0),
+                # Tuning NFE : un job long et exclusif, limité à part pour ne pas bloquer /synthesize
+                "tune": engine("tune", 1, 1, 600.0),
+            },
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "0")),
+            queue_depth_probe=queue_depth_probe,
+        )
+
+    def normalize_engine(self, engine: str) -> str:
+        # XTTS (et tout moteur inconnu) est redirigé vers F5 par le service TTS
+        return engine if engine in self._engines else "f5"
+
+    def _estimated_wait(self, state: _EngineState, ahead: int) -> float:
+        return ahead * state.avg_service_time / state.capacity
+
+    def queue_depth(self):
+        """
+        Profondeur de la file du broker, mise en cache QUEUE_DEPTH_TTL secondes.
+        Appel bloquant (connexion broker) : à exécuter hors de l'event loop.
+        """
+        if self._queue_depth_probe is None:
+            return None
+        measured_at, depth = self._queue_depth
+        if time.monotonic() - measured_at < self.QUEUE_DEPTH_TTL:
+            return depth
+        try:
+            depth = self._queue_depth_probe()
+        except Exception as e:
+            logger.warning(f"Admission | Queue depth unavailable: {e}")
+            depth = None
+        self._queue_depth = (time.monotonic(), depth)
+        return depth
+
+    def admit(self, engine: str, weight: int = 1) -> Ticket:
+        """
+        Réserve `weight` unités de travail pour le moteur, ou lève AdmissionRejected.
+        Peut interroger le broker (ADMISSION_MAX_QUEUE) : à appeler via run_in_threadpool.
+        """
+        engine = self.normalize_engine(engine)
+        state = self._engines[engine]
+
+        depth = self.queue_depth() if self.max_queue else None
+        with self._lock:
+            if depth is not None and depth >= self.max_queue:
+                state.rejected += 1
+                retry_after = self._estimated_wait(state, depth - self.max_queue + 1)
+                logger.warning(f"Admission | Rejected {engine}: broker queue full ({depth}/{self.max_queue})")
+                raise AdmissionRejected(503, max(1, math.ceil(retry_after)),
+                                        "Le service est saturé, réessayez plus tard.")
+
+            if state.max_pending and state.pending + weight > state.max_pending:
+                # Une requête plus grosse que la limite ne passera jamais : on l'accepte seule
+                if not (state.pending == 0 and weight > state.max_pending):
+                    state.rejected += 1
+                    excess = state.pending + weight - state.max_pending
+                    retry_after = self._estimated_wait(state, excess)
+                    logger.warning(f"Admission | Rejected {engine}: {state.pending}/{state.max_pending} pending")
+                    raise AdmissionRejected(429, max(1, math.ceil(retry_after)),
+                                            f"Trop de requêtes en attente pour le moteur '{engine}'.")
+
+            state.pending += weight
+            state.admitted += 1
+        return Ticket(engine, weight)
+
+    def release(self, ticket: Ticket, service_time: float = None):
+        """
+        Libère le jeton et met à jour le temps de service moyen (par unité de travail).
+        `service_time` est la durée d'exécution du job seul (sans l'attente en file), telle que
+        mesurée par le worker ; None (échec, durée inconnue) ne modifie pas la moyenne.
+        """
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            state = self._engines[ticket.engine]
+            state.pending = max(0, state.pending - ticket.weight)
+            if service_time is not None:
+                per_unit = service_time / ticket.weight
+                state.avg_service_time = (1 - self.EWMA_ALPHA) * state.avg_service_time + self.EWMA_ALPHA * per_unit
+
+    def snapshot(self) -> dict:
+        """
+        Charge courante et attente estimée par moteur (signal d'autoscaling).
+        """
+        depth = self.queue_depth()
+        with self._lock:
+            engines = {
+                name: {
+                    "pending": state.pending,
+                    "max_pending": state.max_pending or None,
+                    "capacity": state.capacity,
+                    "utilization": round(state.pending / state.max_pending, 3) if state.max_pending else None,
+                    "avg_service_seconds": round(state.avg_service_time, 2),
+                    "estimated_wait_seconds": round(self._estimated_wait(state, state.pending), 1),
+                    "admitted": state.admitted,
+                    "rejected": state.rejected,
+                }
+                for name, state in self._engines.items()
+            }
+        return {
+            "queue_depth": depth,
+            "max_queue": self.max_queue or None,
+            "engines": engines,
+        }
@@ -0,0 +1,115 @@
+import math
+import os
+
+import torch
+import torch.nn.functional as F
+from loguru import logger
+
+# Mode compilé (opt-in) : torch.compile sur le DiT et le vocodeur
+TTS_COMPILE = os.getenv("TTS_COMPILE", "0") == "1"
+# "default", "reduce-overhead" (CUDA graphs) ou "max-autotune"
+TTS_COMPILE_MODE = os.getenv("TTS_COMPILE_MODE", "default")
+# Taille des buckets de longueur de séquence (frames mel, ~2.7s à 24kHz / hop 256)
+TTS_COMPILE_BUCKET = int(os.getenv("TTS_COMPILE_BUCKET", "256"))
+# Cache disque des graphes compilés (dans le volume models_data pour survivre aux redémarrages)
+TTS_COMPILE_CACHE_DIR = os.getenv("TTS_COMPILE_CACHE_DIR", os.path.expanduser("~/.cache/torchinductor"))
+
+
+def bucket_length(n: int, bucket: int = TTS_COMPILE_BUCKET) -> int:
+    return max(bucket, math.ceil(n / bucket) * bucket)
+
+
+def configure_compile_cache():
+    """
+    Active le cache disque d'Inductor (graphes FX + code généré). Après un redémarrage
+    (ou un rechargement par le registre), Dynamo et AOTAutograd retracent encore chaque
+    bucket ; seule la génération de code Inductor est évitée. Doit être appelé avant la
+    première compilation.
+    """
+    os.makedirs(TTS_COMPILE_CACHE_DIR, exist_ok=True)
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", TTS_COMPILE_CACHE_DIR)
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    try:
+        import torch._inductor.config as inductor_config
+        inductor_config.fx_graph_cache = True
+    except (ImportError, AttributeError):
+        pass
+    # Un graphe par bucket : on relève la limite de recompilation de Dynamo en conséquence
+    torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, 64)
+
+
+class BlockStack(torch.nn.Module):
+    """
+    Pile des blocs du DiT (attention + feed-forward), compilée d'un seul tenant.
+    """
+    def __init__(self, blocks: torch.nn.ModuleList):
+        super().__init__()
+        self.blocks = blocks
+
+    def forward(self, x, t, mask=None, rope=None):
+        for block in self.blocks:
+            x = block(x, t, mask=mask, rope=rope)
+        return x
+
+
+class BucketedBlocks(torch.nn.Module):
+    """
+    Remplace la liste des blocs du DiT : seule la pile de blocs est compilée, les embeddings
+    d'entrée (texte, convolution de position) et la projection de sortie restent en eager
+    à la longueur réelle. La séquence est complétée jusqu'au bucket supérieur à l'entrée de
+    la pile, puis recoupée : le nombre de formes vues par torch.compile est ainsi borné
+    (une compilation par bucket, pas par longueur de texte).
+
+    Les blocs n'opèrent que position par position, sauf l'attention : avec
+    attn_mask_enabled=True (voir model_cfg dans tts.py), les frames ajoutées sont exclues
+    des clés par le masque, et les frames réelles sont identiques au mode eager aux erreurs
+    d'arrondi près. Sans remplissage, le masque fourni par F5 est transmis tel quel (None en
+    batch de 1, ce qui garde le noyau d'attention non masqué).
+    """
+    def __init__(self, stack: BlockStack, compiled, rotary_embed, bucket: int = TTS_COMPILE_BUCKET):
+        super().__init__()
+        self.stack = stack
+        self.compiled = compiled
+        self.rotary_embed = rotary_embed
+        self.bucket = bucket
+
+    def forward(self, x, t, mask=None, rope=None):
+        n = x.shape[1]
+        pad = bucket_length(n, self.bucket) - n
+
+        if pad:
+            if mask is None:
+                mask = torch.ones(x.shape[0], n, dtype=torch.bool, device=x.device)
+            x = F.pad(x, (0, 0, 0, pad))
+            mask = F.pad(mask, (0, pad), value=False)
+            rope = self.rotary_embed.forward_from_seq_len(n + pad)
+
+        out = self.compiled(x, t, mask=mask, rope=rope)
+        return out[:, :n]
+
+
+def compile_dit(model):
+    """
+    Compile la pile de blocs du DiT (model.transformer) du modèle F5 (CFM) avec bucketing des longueurs.
+    Le DiT doit être construit avec attn_mask_enabled=True, sinon les frames ajoutées
+    participent à l'attention et modifient tout l'énoncé.
+    """
+    configure_compile_cache()
+    transformer = model.transformer
+    stack = BlockStack(transformer.transformer_blocks)
+    compiled = torch.compile(stack, mode=TTS_COMPILE_MODE, dynamic=False)
+    transformer.transformer_blocks = torch.nn.ModuleList([BucketedBlocks(stack, compiled, transformer.rotary_embed)])
+    logger.info(f"Compile | DiT blocks wrapped with torch.compile (mode={TTS_COMPILE_MODE}, bucket={TTS_COMPILE_BUCKET} frames)")
+    return model
+
+
+def compile_vocoder(vocoder):
+    """
+    Compile le décodage Vocos (mel -> forme d'onde) en formes dynamiques, sans remplissage :
+    les convolutions de Vocos ne sont pas masquables, un remplissage jusqu'au bucket
+    modifierait la fin de chaque énoncé. La sortie est celle du mode eager.
+    """
+    configure_compile_cache()
+    vocoder.decode = torch.compile(vocoder.decode, mode=TTS_COMPILE_MODE, dynamic=True)
+    logger.info("Compile | Vocoder decode wrapped with torch.compile (dynamic shapes)")
+    return vocoder
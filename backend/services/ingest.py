@@ -0,0 +1,206 @@
+import json
+import os
+import re
+import subprocess
+import uuid
+import wave
+
+from fastapi.concurrency import run_in_threadpool
+from loguru import logger
+
+# Limites d'ingestion pour /transcribe (vérifiées avant tout décodage ffmpeg/Whisper)
+UPLOAD_MAX_BYTES = int(float(os.getenv("UPLOAD_MAX_MB", "25")) * 1024 * 1024)
+UPLOAD_MAX_SECONDS = float(os.getenv("UPLOAD_MAX_SECONDS", "120"))
+# Taille des blocs lus/écrits : la mémoire utilisée par upload reste bornée à ce bloc
+SPOOL_CHUNK_SIZE = 256 * 1024
+SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", "uploads")
+
+# Formats compressés/conteneurs acceptés tels quels (ffmpeg les décode directement)
+ALLOWED_FORMATS = {"wav", "webm", "ogg", "opus", "mp3", "m4a", "mp4", "aac", "flac", "mov", "matroska"}
+
+
+class UploadRejected(Exception):
+    """
+    Levée quand un upload est refusé à l'ingestion.
+    `status_code` vaut 411 (taille inconnue/invalide), 413 (trop gros/trop long), 415 (format) ou 422 (illisible).
+    """
+    def __init__(self, status_code: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+
+
+class PcmFormat:
+    """
+    Description d'un flux PCM brut (signé 16 bits little-endian).
+    Lève UploadRejected (422) si la fréquence ou le nombre de canaux est invalide.
+    """
+    def __init__(self, sample_rate, channels):
+        try:
+            self.sample_rate = int(sample_rate)
+            self.channels = int(channels)
+        except (TypeError, ValueError):
+            raise UploadRejected(422, f"Paramètres PCM invalides (sample_rate={sample_rate}, channels={channels}).")
+        if not 8000 <= self.sample_rate <= 192000:
+            raise UploadRejected(422, f"Fréquence PCM invalide: {self.sample_rate} (8000-192000).")
+        if not 1 <= self.channels <= 8:
+            raise UploadRejected(422, f"Nombre de canaux PCM invalide: {self.channels} (1-8).")
+
+    @property
+    def bytes_per_second(self) -> int:
+        return self.sample_rate * self.channels * 2
+
+
+def parse_pcm_content_type(content_type: str, query: dict):
+    """
+    Reconnaît un upload PCM brut : `audio/L16;rate=16000;channels=1` (RFC 2586)
+    ou `application/octet-stream` avec `?format=pcm_s16le&sample_rate=...&channels=...`.
+    Renvoie un PcmFormat, ou None si ce n'est pas du PCM brut.
+    """
+    content_type = content_type.lower()
+    if content_type.startswith("audio/l16"):
+        params = dict(re.findall(r"(\w+)=([^;\s]+)", content_type))
+        return PcmFormat(params.get("rate", 16000), params.get("channels", 1))
+    if query.get("format") == "pcm_s16le":
+        return PcmFormat(query.get("sample_rate", 16000), query.get("channels", 1))
+    return None
+
+
+def check_content_length(content_length: str, required: bool = False, max_bytes: int = UPLOAD_MAX_BYTES):
+    """
+    Refuse immédiatement un upload annoncé comme trop gros (avant de lire le corps).
+    """
+    if content_length is None:
+        if required:
+            raise UploadRejected(411, "Content-Length requis.")
+        return
+    if not content_length.isdigit():
+        raise UploadRejected(411, "Content-Length invalide.")
+    if int(content_length) > max_bytes:
+        raise UploadRejected(413, f"Fichier trop volumineux (max {max_bytes / (1024 * 1024):g} Mo).")
+
+
+async def read_upload(upload, max_bytes: int) -> bytes:
+    """
+    Lit un petit upload en mémoire (fichier de textes), par blocs, en coupant au-delà de `max_bytes`.
+    """
+    content = bytearray()
+    async for chunk in iter_upload(upload):
+        content += chunk
+        if len(content) > max_bytes:
+            raise UploadRejected(413, f"Fichier trop volumineux (max {max_bytes / (1024 * 1024):g} Mo).")
+    return bytes(content)
+
+
+def safe_extension(filename: str) -> str:
+    """
+    Extension du fichier envoyé, limitée aux caractères sûrs : le nom client
+    n'est jamais réutilisé tel quel dans un chemin ou une commande shell.
+    """
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    return ext if re.fullmatch(r"[a-z0-9]{1,5}", ext) else "bin"
+
+
+async def spool_stream(chunks, extension: str, pcm: PcmFormat = None) -> str:
+    """
+    Écrit un flux d'octets (itérateur asynchrone) dans un fichier du spool, bloc par bloc,
+    sans bloquer l'event loop. Coupe dès que UPLOAD_MAX_BYTES (ou, pour du PCM brut,
+    UPLOAD_MAX_SECONDS) est dépassé. Le PCM brut reçoit seulement un en-tête WAV (pas de transcodage).
+    Renvoie le chemin du fichier spoolé.
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    path = os.path.join(SPOOL_DIR, f"upload_{uuid.uuid4()}.{'wav' if pcm else extension}")
+    max_bytes = UPLOAD_MAX_BYTES
+    if pcm:
+        max_bytes = min(max_bytes, int(UPLOAD_MAX_SECONDS * pcm.bytes_per_second))
+
+    if pcm:
+        writer = wave.open(path, "wb")
+        writer.setnchannels(pcm.channels)
+        writer.setsampwidth(2)
+        writer.setframerate(pcm.sample_rate)
+        write = writer.writeframesraw
+    else:
+        writer = open(path, "wb")
+        write = writer.write
+
+    received = 0
+    try:
+        async for chunk in chunks:
+            received += len(chunk)
+            if received > max_bytes:
+                raise UploadRejected(413, "Fichier trop volumineux ou trop long.")
+            await run_in_threadpool(write, chunk)
+    except BaseException:
+        writer.close()
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    await run_in_threadpool(writer.close)
+
+    if received == 0:
+        os.remove(path)
+        raise UploadRejected(422, "Fichier vide.")
+    logger.debug(f"Ingest | Spooled {received} bytes to {path}")
+    return path
+
+
+async def iter_upload(upload, chunk_size: int = SPOOL_CHUNK_SIZE):
+    """
+    Itère sur un UploadFile par blocs (lecture asynchrone).
+    """
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def probe_audio(path: str) -> dict:
+    """
+    Lit uniquement l'en-tête du fichier (ffprobe, sans décodage) : format, codec,
+    fréquence, canaux et durée (None si le conteneur ne l'annonce pas, ex: webm de MediaRecorder).
+    """
+    try:
+        proc = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "a:0",
+             "-show_entries", "format=format_name,duration:stream=codec_name,sample_rate,channels",
+             "-of", "json", path],
+            capture_output=True, timeout=10, check=True,
+        )
+        data = json.loads(proc.stdout or b"{}")
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        # OSError : ffprobe absent ou non exécutable (FileNotFoundError n'est pas une SubprocessError)
+        raise UploadRejected(422, f"Fichier audio illisible: {e}")
+
+    streams = data.get("streams") or []
+    if not streams:
+        raise UploadRejected(422, "Aucune piste audio trouvée.")
+
+    fmt = data.get("format", {})
+    duration = fmt.get("duration")
+    try:
+        duration = float(duration) if duration not in (None, "N/A") else None
+    except ValueError:
+        duration = None
+
+    return {
+        "formats": fmt.get("format_name", "").split(","),
+        "codec": streams[0].get("codec_name"),
+        "sample_rate": int(streams[0].get("sample_rate") or 0),
+        "channels": int(streams[0].get("channels") or 0),
+        "duration": duration,
+    }
+
+
+def validate_audio(path: str) -> dict:
+    """
+    Vérifie format et durée d'un fichier spoolé avant tout traitement coûteux.
+    """
+    info = probe_audio(path)
+    if not ALLOWED_FORMATS.intersection(info["formats"]):
+        raise UploadRejected(415, f"Format audio non supporté: {','.join(info['formats'])}")
+    if info["duration"] is not None and info["duration"] > UPLOAD_MAX_SECONDS:
+        raise UploadRejected(413, f"Audio trop long ({info['duration']:.0f}s, max {UPLOAD_MAX_SECONDS:.0f}s).")
+    logger.debug(f"Ingest | Probed {path}: {info}")
+    return info
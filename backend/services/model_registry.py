@@ -0,0 +1,339 @@
+import gc
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import torch
+from loguru import logger
+
+
+def estimate_footprint(obj) -> int:
+    """
+    Estime l'empreinte mémoire (en octets) d'un modèle.
+    Pour un nn.Module, on additionne la taille des paramètres et des buffers.
+    Les objets inconnus (ex: modèles non-torch) sont comptés à 0.
+    """
+    if isinstance(obj, torch.nn.Module):
+        total = 0
+        for tensor in list(obj.parameters()) + list(obj.buffers()):
+            total += tensor.numel() * tensor.element_size()
+        return total
+    return 0
+
+
+def model_device(obj) -> str:
+    """
+    Device où résident les paramètres du modèle ("cpu", "cuda:0"...).
+    Les objets inconnus sont considérés en RAM.
+    """
+    if isinstance(obj, torch.nn.Module):
+        for tensor in obj.parameters():
+            return str(tensor.device)
+    return "cpu"
+
+
+def available_system_memory() -> int | None:
+    """
+    Mémoire RAM disponible sur l'hôte (en octets), ou None si non mesurable.
+    """
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def available_memory(device: str) -> int | None:
+    """
+    Mémoire libre sur le device donné : VRAM (torch.cuda.mem_get_info) pour un GPU,
+    RAM de l'hôte sinon. None si non mesurable.
+    """
+    if device.startswith("cuda"):
+        try:
+            return torch.cuda.mem_get_info(torch.device(device))[0]
+        except (RuntimeError, AssertionError):
+            return None
+    return available_system_memory()
+
+
+class _ModelEntry:
+    """
+    État interne d'un modèle enregistré (chargeur, instance résidente, statistiques).
+    """
+    def __init__(self, name: str, loader, on_unload=None):
+        self.name = name
+        self.loader = loader
+        self.on_unload = on_unload
+        self.instance = None
+        self.footprint = 0
+        self.expected_footprint = 0
+        self.device = "cpu"
+        self.in_use = 0
+        self.last_used = 0.0
+        self.load_count = 0
+        self.load_seconds = 0.0
+        self.load_lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Registre des modèles lourds (F5 DiT, Vocos, Whisper...) avec budget mémoire.
+
+    Chaque modèle est chargé à la demande via `acquire()`, puis déchargé :
+    - après `idle_timeout` secondes sans utilisation (balayage en tâche de fond),
+    - ou sous pression mémoire (budget dépassé / mémoire libre insuffisante),
+      en évinçant d'abord les modèles inutilisés depuis le plus longtemps (LRU).
+    La mémoire libre est mesurée par device : un manque de RAM n'évince que les modèles
+    en RAM, un manque de VRAM que les modèles sur ce GPU.
+    Un modèle en cours d'utilisation n'est jamais déchargé.
+    """
+    def __init__(self, budget_bytes: int = 0, idle_timeout: float = 0.0,
+                 min_free_bytes: int = 0, sweep_interval: float = 30.0, max_events: int = 200):
+        self.budget_bytes = budget_bytes
+        self.idle_timeout = idle_timeout
+        self.min_free_bytes = min_free_bytes
+        self.sweep_interval = sweep_interval
+        self._entries: dict[str, _ModelEntry] = {}
+        self._lock = threading.RLock()
+        self._events = deque(maxlen=max_events)
+        self._listeners = []
+        self._sweeper = None
+
+    @classmethod
+    def from_env(cls):
+        """
+        Construit le registre depuis les variables d'environnement :
+        MODEL_MEMORY_BUDGET_MB, MODEL_IDLE_TIMEOUT (secondes), MODEL_MIN_FREE_MB.
+        Une valeur de 0 désactive la contrainte correspondante.
+        """
+        return cls(
+            budget_bytes=int(float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0")) * 1024 * 1024),
+            idle_timeout=float(os.getenv("MODEL_IDLE_TIMEOUT", "0")),
+            min_free_bytes=int(float(os.getenv("MODEL_MIN_FREE_MB", "0")) * 1024 * 1024),
+            sweep_interval=float(os.getenv("MODEL_SWEEP_INTERVAL", "30")),
+        )
+
+    def register(self, name: str, loader, on_unload=None):
+        """
+        Déclare un modèle. `loader` est appelé (sans argument) pour le charger
+        et doit renvoyer l'instance. `on_unload(instance)` est optionnel.
+        """
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _ModelEntry(name, loader, on_unload)
+        self._start_sweeper()
+
+    def add_listener(self, callback):
+        """
+        `callback()` est appelé après chaque chargement/déchargement (ex: publication de l'état).
+        """
+        self._listeners.append(callback)
+
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Model Registry | Listener failed: {e}")
+
+    def is_loaded(self, name: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(name)
+            return entry is not None and entry.instance is not None
+
+    @contextmanager
+    def acquire(self, name: str):
+        """
+        Fournit l'instance du modèle (chargée si nécessaire) pour la durée du bloc `with`.
+        Le modèle est marqué "en cours d'utilisation" et ne peut pas être évincé.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown model: {name}")
+
+        with entry.load_lock:
+            with self._lock:
+                ready = entry.instance is not None
+                if ready:
+                    entry.in_use += 1
+                    entry.last_used = time.time()
+            if not ready:
+                self._load(entry)
+        try:
+            yield entry.instance
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+
+    def _load(self, entry: _ModelEntry):
+        """
+        Charge le modèle et le marque immédiatement "en cours d'utilisation"
+        pour qu'il ne puisse pas être évincé avant d'être fourni à l'appelant.
+        """
+        logger.info(f"Model Registry | Loading '{entry.name}'...")
+        # On libère la place à l'avance si l'empreinte est connue (rechargement)
+        self._relieve_pressure(exclude=entry.name, incoming=entry.expected_footprint, device=entry.device)
+
+        start = time.perf_counter()
+        instance = entry.loader()
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            entry.instance = instance
+            entry.in_use += 1
+            entry.last_used = time.time()
+            entry.footprint = estimate_footprint(instance)
+            entry.expected_footprint = entry.footprint
+            entry.device = model_device(instance)
+            entry.load_count += 1
+            entry.load_seconds = elapsed
+            self._record("load", entry, duration=round(elapsed, 3), device=entry.device)
+        logger.success(f"Model Registry | '{entry.name}' loaded in {elapsed:.1f}s "
+                       f"({entry.footprint / 1024 / 1024:.0f} MB on {entry.device})")
+        self._notify()
+
+        # Le nouveau modèle peut lui-même faire dépasser le budget
+        self._relieve_pressure(exclude=entry.name)
+
+    def unload(self, name: str, reason: str = "manual") -> bool:
+        """
+        Décharge un modèle s'il est résident et inutilisé. Renvoie True si déchargé.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            return False
+
+        with self._lock:
+            if entry.instance is None or entry.in_use > 0:
+                return False
+            instance = entry.instance
+            entry.instance = None
+            footprint = entry.footprint
+            entry.footprint = 0
+            self._record("unload", entry, reason=reason, freed=footprint)
+
+        if entry.on_unload:
+            try:
+                entry.on_unload(instance)
+            except Exception as e:
+                logger.error(f"Model Registry | on_unload failed for '{name}': {e}")
+        del instance
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+        logger.info(f"Model Registry | Unloaded '{name}' ({reason}, {footprint / 1024 / 1024:.0f} MB freed)")
+        self._notify()
+        return True
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(e.footprint for e in self._entries.values() if e.instance is not None)
+
+    def _over_budget(self, incoming: int = 0) -> bool:
+        return bool(self.budget_bytes) and self.resident_bytes() + incoming > self.budget_bytes
+
+    def _low_memory_devices(self, incoming: int = 0, device: str = "cpu") -> set:
+        """
+        Devices dont la mémoire libre passe sous `min_free_bytes` (en comptant le modèle à charger).
+        """
+        if not self.min_free_bytes:
+            return set()
+        with self._lock:
+            devices = {e.device for e in self._entries.values() if e.instance is not None}
+        devices.add(device)
+        low = set()
+        for d in devices:
+            free = available_memory(d)
+            if free is not None and free - (incoming if d == device else 0) < self.min_free_bytes:
+                low.add(d)
+        return low
+
+    def _relieve_pressure(self, exclude: str = None, incoming: int = 0, device: str = "cpu"):
+        """
+        Évince les modèles inutilisés (LRU) tant que la contrainte mémoire n'est pas respectée.
+        Le budget concerne tous les modèles ; un manque de mémoire libre seulement ceux du device concerné.
+        """
+        while True:
+            over_budget = self._over_budget(incoming)
+            low_devices = self._low_memory_devices(incoming, device)
+            if not over_budget and not low_devices:
+                return
+            with self._lock:
+                candidates = [
+                    e for e in self._entries.values()
+                    if e.instance is not None and e.in_use == 0 and e.name != exclude
+                    and (over_budget or e.device in low_devices)
+                ]
+            if not candidates:
+                logger.warning(f"Model Registry | Memory pressure ({', '.join(sorted(low_devices)) or 'budget'}) "
+                               "but no idle model to evict.")
+                return
+            victim = min(candidates, key=lambda e: e.last_used)
+            if not self.unload(victim.name, reason="memory_pressure"):
+                return
+
+    def sweep(self):
+        """
+        Décharge les modèles inactifs depuis plus de `idle_timeout` secondes,
+        puis vérifie la pression mémoire.
+        """
+        if self.idle_timeout > 0:
+            now = time.time()
+            with self._lock:
+                idle = [
+                    e.name for e in self._entries.values()
+                    if e.instance is not None and e.in_use == 0 and now - e.last_used > self.idle_timeout
+                ]
+            for name in idle:
+                self.unload(name, reason="idle")
+        self._relieve_pressure()
+
+    def _start_sweeper(self):
+        if self._sweeper is not None or (self.idle_timeout <= 0 and not self.min_free_bytes):
+            return
+
+        def _loop():
+            while True:
+                time.sleep(self.sweep_interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Model Registry | Sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=_loop, name="model-registry-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _record(self, event: str, entry: _ModelEntry, **details):
+        self._events.append({"time": time.time(), "event": event, "model": entry.name, **details})
+
+    def snapshot(self) -> dict:
+        """
+        État courant pour le monitoring : modèles résidents, empreinte, derniers événements.
+        """
+        with self._lock:
+            models = {
+                e.name: {
+                    "loaded": e.instance is not None,
+                    "footprint_mb": round(e.footprint / 1024 / 1024, 1),
+                    "device": e.device,
+                    "in_use": e.in_use,
+                    "last_used": e.last_used or None,
+                    "load_count": e.load_count,
+                    "last_load_seconds": round(e.load_seconds, 3),
+                }
+                for e in self._entries.values()
+            }
+            return {
+                "resident": [name for name, m in models.items() if m["loaded"]],
+                "resident_mb": round(self.resident_bytes() / 1024 / 1024, 1),
+                "budget_mb": round(self.budget_bytes / 1024 / 1024, 1) if self.budget_bytes else None,
+                "idle_timeout": self.idle_timeout or None,
+                "models": models,
+                "events": list(self._events),
+            }
+
+
+model_registry = ModelRegistry.from_env()
@@ -0,0 +1,219 @@
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import torch
+from loguru import logger
+
+# Profilage à la demande : flag de requête / en-tête X-Profile, ou échantillonnage aléatoire
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Intervalle d'échantillonnage des piles Python (secondes)
+PROFILE_STACK_INTERVAL = float(os.getenv("PROFILE_STACK_INTERVAL_MS", "5")) / 1000
+# Rétention des traces : nombre max de fichiers et taille totale max (Mo) dans PROFILE_DIR
+PROFILE_MAX_TRACES = int(os.getenv("PROFILE_MAX_TRACES", "50"))
+PROFILE_MAX_TOTAL_MB = float(os.getenv("PROFILE_MAX_TOTAL_MB", "2048"))
+# Premier identifiant de "thread" sous lequel les piles Python apparaissent dans la trace Chrome
+SAMPLER_TID = 999999
+
+
+def should_profile(requested: bool = False) -> bool:
+    """
+    Décide si une requête est profilée : demandée explicitement, ou tirée au sort (PROFILE_SAMPLE_RATE).
+    """
+    return bool(requested) or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+
+def trace_path(profile_id: str):
+    """
+    Chemin de la trace d'un job, ou None si l'identifiant est invalide (pas de traversée de chemin).
+    """
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", profile_id or ""):
+        return None
+    return os.path.join(PROFILE_DIR, f"{profile_id}.json")
+
+
+class StackSampler:
+    """
+    Échantillonne périodiquement les piles Python (sys._current_frames) du thread profilé et de
+    tous les threads démarrés pendant la capture (pools de threads des bibliothèques...), pour voir
+    le temps passé hors des opérateurs torch (prétraitement, I/O, ffmpeg...).
+    """
+    def __init__(self, thread_id: int, interval: float = PROFILE_STACK_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = []  # [(instant, {thread_id: pile})]
+        self.thread_names = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-stack-sampler", daemon=True)
+
+    def start(self):
+        # Les threads déjà présents (autres requêtes, threads de fond) ne sont pas échantillonnés
+        self._ignored = {t.ident for t in threading.enumerate()} - {self.thread_id}
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def _run(self):
+        self._ignored.add(threading.get_ident())
+        while not self._stop.wait(self.interval):
+            sampled_at = time.perf_counter()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = {}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in self._ignored:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                stacks[thread_id] = stack
+                self.thread_names.setdefault(thread_id, names.get(thread_id, str(thread_id)))
+            self.samples.append((sampled_at, stacks))
+
+    def to_trace_events(self, pid, base_us: float) -> list:
+        """
+        Convertit les échantillons en événements Chrome "X" (flame chart), une piste par thread :
+        des échantillons consécutifs partageant un même préfixe de pile forment un seul bloc.
+        """
+        def ts(t):
+            return base_us + (t - self.started) * 1e6
+
+        events = []
+        # Le thread profilé en premier, puis les threads dans l'ordre d'apparition
+        threads = [self.thread_id] + [t for t in self.thread_names if t != self.thread_id]
+        for index, thread_id in enumerate(threads):
+            tid = SAMPLER_TID + index
+            label = "request thread" if thread_id == self.thread_id else self.thread_names[thread_id]
+            events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid,
+                           "args": {"name": f"Python stacks: {label}"}})
+            open_frames = []  # [(nom, début)]
+
+            def close_from(depth, end):
+                while len(open_frames) > depth:
+                    name, start = open_frames.pop()
+                    events.append({"ph": "X", "cat": "python", "name": name, "pid": pid, "tid": tid,
+                                   "ts": ts(start), "dur": (end - start) * 1e6})
+
+            for sampled_at, stacks in self.samples:
+                # Un thread absent de l'échantillon (terminé, pas encore lancé) ferme ses blocs
+                stack = stacks.get(thread_id, [])
+                common = 0
+                while common < min(len(stack), len(open_frames)) and open_frames[common][0] == stack[common]:
+                    common += 1
+                close_from(common, sampled_at)
+                for name in stack[common:]:
+                    open_frames.append((name, sampled_at))
+            close_from(0, self.stopped)
+        return events
+
+
+class ProfileTrace:
+    """
+    Résultat d'une capture : identifiant et chemin de la trace Chrome (None si la capture a échoué).
+    """
+    def __init__(self, profile_id: str):
+        self.profile_id = profile_id
+        self.path = None
+
+
+@contextmanager
+def profile_trace(profile_id: str, enabled: bool = True):
+    """
+    Capture torch.profiler (opérateurs CPU/CUDA, formes, piles) + échantillonnage des piles Python
+    pendant le bloc `with`, puis écrit une trace Chrome unique dans PROFILE_DIR/{profile_id}.json
+    (à ouvrir dans chrome://tracing ou ui.perfetto.dev).
+    Si `enabled` est faux, ne fait rien (coût nul pour les requêtes non profilées).
+    Un échec du profileur (ex: autre session Kineto déjà active) n'échoue jamais la requête :
+    elle s'exécute alors sans profilage.
+    """
+    trace = ProfileTrace(profile_id)
+    profiler = None
+    if enabled:
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        try:
+            profiler = torch.profiler.profile(activities=activities, record_shapes=True, with_stack=True)
+            profiler.__enter__()
+        except Exception as e:
+            logger.error(f"Profiling | Could not start profiler for {profile_id}, running unprofiled: {e}")
+            profiler = None
+
+    if profiler is None:
+        yield trace
+        return
+
+    sampler = StackSampler(threading.get_ident())
+    logger.info(f"Profiling | Capturing trace {profile_id}...")
+    sampler.start()
+    try:
+        yield trace
+    finally:
+        sampler.stop()
+        try:
+            profiler.__exit__(None, None, None)
+            trace.path = _write_trace(profile_id, profiler, sampler)
+            logger.info(f"Profiling | Trace saved: {trace.path}")
+        except Exception as e:
+            logger.error(f"Profiling | Failed to write trace {profile_id}: {e}")
+        _prune_traces()
+
+
+def _write_trace(profile_id: str, profiler, sampler: StackSampler) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = trace_path(profile_id)
+    tmp_path = f"{path}.torch.tmp"
+    profiler.export_chrome_trace(tmp_path)
+    try:
+        with open(tmp_path) as f:
+            data = json.load(f)
+    finally:
+        os.remove(tmp_path)
+
+    events = data.get("traceEvents", [])
+    timed_events = [e["ts"] for e in events if isinstance(e.get("ts"), (int, float))]
+    base_us = min(timed_events) if timed_events else 0
+    pid = next((e["pid"] for e in events if "pid" in e), os.getpid())
+    events.extend(sampler.to_trace_events(pid, base_us))
+    data["traceEvents"] = events
+
+    with open(path, "w") as f:
+        json.dump(data, f)
+    return path
+
+
+def _prune_traces():
+    """
+    Supprime les traces les plus anciennes au-delà de PROFILE_MAX_TRACES fichiers
+    ou PROFILE_MAX_TOTAL_MB au total (avec PROFILE_SAMPLE_RATE > 0, le disque se remplirait).
+    """
+    try:
+        entries = [e for e in os.scandir(PROFILE_DIR) if e.is_file() and e.name.endswith(".json")]
+        traces = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries), reverse=True)
+    except OSError:
+        return
+
+    max_bytes = PROFILE_MAX_TOTAL_MB * 1024 * 1024
+    kept, total = 0, 0
+    for _, size, path in traces:
+        if kept < PROFILE_MAX_TRACES and total + size <= max_bytes:
+            kept += 1
+            total += size
+            continue
+        try:
+            os.remove(path)
+            logger.debug(f"Profiling | Pruned old trace {path}")
+        except OSError:
+            pass
@@ -0,0 +1,137 @@
+import os
+
+import torch
+import torchaudio
+from loguru import logger
+
+# Durée cible de la référence vocale : le coût F5-TTS croît avec (référence + texte généré),
+# une référence de 30s ralentit donc toutes les synthèses suivantes avec cette voix.
+REF_TARGET_DURATION = float(os.getenv("REF_TARGET_DURATION", "10"))
+# En dessous de cette durée, un extrait n'est pas considéré comme une référence valable.
+REF_MIN_DURATION = float(os.getenv("REF_MIN_DURATION", "3"))
+# Marge conservée autour des mots pour ne pas couper les attaques/chutes.
+REF_EDGE_PADDING = 0.1
+# Un silence au moins aussi long entre deux mots est considéré comme une frontière naturelle.
+PAUSE_THRESHOLD = 0.3
+
+
+def extract_words(transcription: dict) -> list[dict]:
+    """
+    Aplatit les mots horodatés d'un résultat Whisper (transcribe(word_timestamps=True)).
+    Chaque mot garde l'indice de son segment et la probabilité "no speech" du segment.
+    """
+    words = []
+    for seg_index, segment in enumerate(transcription.get("segments", [])):
+        for word in segment.get("words", []):
+            words.append({
+                "word": word["word"],
+                "start": float(word["start"]),
+                "end": float(word["end"]),
+                "probability": float(word.get("probability", 1.0)),
+                "segment": seg_index,
+                "no_speech_prob": float(segment.get("no_speech_prob", 0.0)),
+            })
+    return words
+
+
+def _is_left_boundary(words: list[dict], i: int) -> bool:
+    if i == 0 or words[i]["segment"] != words[i - 1]["segment"]:
+        return True
+    return words[i]["start"] - words[i - 1]["end"] >= PAUSE_THRESHOLD
+
+
+def _is_right_boundary(words: list[dict], j: int) -> bool:
+    if j == len(words) - 1 or words[j]["segment"] != words[j + 1]["segment"]:
+        return True
+    if words[j]["word"].strip()[-1:] in ".!?,;:":
+        return True
+    return words[j + 1]["start"] - words[j]["end"] >= PAUSE_THRESHOLD
+
+
+def select_reference_span(words: list[dict], target_duration: float = REF_TARGET_DURATION,
+                          min_duration: float = REF_MIN_DURATION):
+    """
+    Choisit l'extrait le plus "propre" d'au plus `target_duration` secondes, coupé sur des mots.
+
+    Score d'un extrait (plus haut = meilleur) :
+    - confiance moyenne de Whisper sur les mots (mots mal reconnus = ref_text faux),
+    - bonus si l'extrait commence et finit sur une frontière naturelle (pause, ponctuation, segment),
+    - bonus proportionnel au remplissage de la durée cible (plus de contexte vocal),
+    - pénalité selon la probabilité de non-parole des segments.
+
+    Renvoie (start, end, text) en secondes, ou None si aucun extrait ne convient.
+    """
+    best = None
+    best_score = float("-inf")
+
+    for i in range(len(words)):
+        prob_sum = 0.0
+        no_speech_sum = 0.0
+        for j in range(i, len(words)):
+            duration = words[j]["end"] - words[i]["start"]
+            if duration > target_duration:
+                break
+            prob_sum += words[j]["probability"]
+            no_speech_sum += words[j]["no_speech_prob"]
+            if duration < min_duration:
+                continue
+
+            count = j - i + 1
+            score = prob_sum / count
+            score -= 0.5 * no_speech_sum / count
+            score += 0.3 * (duration / target_duration)
+            if _is_left_boundary(words, i):
+                score += 0.2
+            if _is_right_boundary(words, j):
+                score += 0.2
+
+            if score > best_score:
+                best_score = score
+                best = (i, j)
+
+    if best is None:
+        return None
+
+    i, j = best
+    # Marge autour des mots, sans déborder sur le mot voisin
+    start = words[i]["start"] - REF_EDGE_PADDING
+    if i > 0:
+        start = max(start, (words[i - 1]["end"] + words[i]["start"]) / 2)
+    end = words[j]["end"] + REF_EDGE_PADDING
+    if j < len(words) - 1:
+        end = min(end, (words[j]["end"] + words[j + 1]["start"]) / 2)
+
+    text = "".join(w["word"] for w in words[i:j + 1]).strip()
+    return max(0.0, start), end, text
+
+
+def trim_reference(audio_path: str, transcription: dict, target_duration: float = REF_TARGET_DURATION):
+    """
+    Coupe la référence vocale (fichier modifié sur place) au meilleur extrait de `target_duration` secondes.
+    Renvoie (durée, texte) de la nouvelle référence, ou None si aucune coupe n'est nécessaire/possible.
+    """
+    info = torchaudio.info(audio_path)
+    duration = info.num_frames / info.sample_rate
+    if duration <= target_duration:
+        return None
+
+    span = select_reference_span(extract_words(transcription), target_duration)
+    if span is None:
+        logger.warning(f"Reference trim | No clean span found in {duration:.1f}s reference, keeping it whole.")
+        return None
+
+    start, end, text = span
+    audio, sr = torchaudio.load(audio_path)
+    audio = audio[:, int(start * sr):int(end * sr)]
+
+    # Fondu très court pour éviter les clics aux points de coupe
+    fade = min(int(0.01 * sr), audio.shape[1] // 2)
+    if fade > 0:
+        ramp = torch.linspace(0.0, 1.0, fade)
+        audio[:, :fade] *= ramp
+        audio[:, -fade:] *= ramp.flip(0)
+
+    torchaudio.save(audio_path, audio, sr)
+    new_duration = audio.shape[1] / sr
+    logger.info(f"Reference trim | {duration:.1f}s -> {new_duration:.1f}s ({start:.2f}s-{end:.2f}s): '{text[:80]}'")
+    return new_duration, text
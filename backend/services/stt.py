@@ -0,0 +1,18 @@
+import whisper
+
+from services.model_registry import model_registry
+
+# On utilise le modèle "base" qui offre un bon compromis vitesse/précision.
+WHISPER_MODEL = "base"
+
+# Enregistré dans le registre du processus courant (API pour /transcribe,
+# worker pour l'évaluation d'intelligibilité du tuning NFE).
+model_registry.register("whisper", lambda: whisper.load_model(WHISPER_MODEL))
+
+
+def transcribe(audio_path: str, **options) -> dict:
+    """
+    Transcription Whisper (lourd CPU/GPU) en français.
+    """
+    with model_registry.acquire("whisper") as model:
+        return model.transcribe(audio_path, language="fr", **options)
@@ -1,13 +1,20 @@
 import torch
 import torchaudio
 from f5_tts.model import DiT
-from f5_tts.infer.utils_infer import load_model, load_vocoder, infer_process
+from f5_tts.infer import utils_infer as f5_infer
+from f5_tts.infer.utils_infer import load_model, load_vocoder, chunk_text
+from f5_tts.model.utils import convert_char_to_pinyin
 from huggingface_hub import hf_hub_download
+import numpy as np
 import os
 
 from loguru import logger
 import time
 
+from services.model_registry import model_registry
+from torch.profiler import record_function
+from services.compile import TTS_COMPILE, compile_dit, compile_vocoder
+
 class TTSService:
     """
     Service gérant la synthèse vocale (Text-to-Speech).
@@ -23,62 +30,75 @@ class TTSService:
         self.model_name = "F5-TTS"
         self.repo_id = "SWivid/F5-TTS"
         self.model_ckpt = "F5TTS_Base/model_1200000.safetensors"
+
+        # Paramètres d'inférence
+        # speed: Vitesse de la parole (0.9 est plus posé et clair)
+        self.default_speed = 0.9
+        # nfe: Steps de génération. 32 = Rapide, 64 = Haute Qualité.
+        # On passe à 64 pour améliorer la clarté suite aux retours utilisateurs.
+        self.default_nfe = 64
         
         # Le modèle et le vocodeur sont chargés à la demande (lazy loading)
-        self.model = None
-        self.vocoder = None
-        self.is_loading = False
-        
-    def _ensure_model_loaded(self):
+        # via le registre, qui peut aussi les décharger après inactivité.
+        model_registry.register("f5_dit", self._load_dit)
+        model_registry.register("vocos", self._load_vocoder)
+
+    def _load_dit(self):
         """
-        Vérifie si le modèle F5-TTS est chargé. Si non, le charge en mémoire.
-        Cette méthode est appelée avant chaque synthèse 'avancée'.
+        Charge le modèle principal F5-TTS (DiT). Appelé par le registre à la demande.
         """
-        if self.model is None and not self.is_loading:
-            self.is_loading = True
-            logger.info("Initializing F5-TTS Service (Low-Level mode)...")
-            
-            try:
-                # 1. Téléchargement ou vérification du cache du checkpoint du modèle
-                logger.info(f"Checking checkpoint: {self.model_ckpt}")
-                ckpt_path = hf_hub_download(repo_id=self.repo_id, filename=self.model_ckpt)
-                
-                # 2. Configuration de l'architecture du modèle DiT (Diffusion Transformer)
-                # Ces paramètres doivent correspondre à ceux utilisés lors de l'entraînement
-                model_cfg = dict(dim=1024, depth=22, heads=16, ff_mult=2, text_dim=512, conv_layers=4)
-                
-                # 3. Chargement du modèle principal (DiT)
-                logger.info(f"Loading DiT model on {self.device}...")
-                self.model = load_model(
-                    model_cls=DiT,
-                    model_cfg=model_cfg,
-                    ckpt_path=ckpt_path,
-                    device=self.device,
-                    mel_spec_type="vocos"
-                )
-                
-                # OPTIMIZATION: Use FP16 on GPU to save VRAM (Critical for 4GB cards like GTX 1650)
-                if self.device == "cuda":
-                    logger.info("Switching to FP16 (Half Precision) for VRAM optimization...")
-                    self.model = self.model.half()
-                else:
-                    self.model = self.model.float()
-                
-                # 4. Chargement du Vocodeur (Vocos) séparément
-                # Le vocodeur transforme les spectrogrammes générés par le DiT en forme d'onde audio
-                logger.info("Loading Vocoder (Vocos)...")
-                self.vocoder = load_vocoder(vocoder_name="vocos", device=self.device)
-                
-                logger.success(f"F5-TTS Service ready for voice cloning. CUDA: {torch.cuda.is_available()}")
-            except Exception as e:
-                logger.critical(f"TTS Initialization failed: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
-                self.model = None
-                raise
-            finally:
-                self.is_loading = False
+        logger.info("Initializing F5-TTS Service (Low-Level mode)...")
+        try:
+            # 1. Téléchargement ou vérification du cache du checkpoint du modèle
+            logger.info(f"Checking checkpoint: {self.model_ckpt}")
+            ckpt_path = hf_hub_download(repo_id=self.repo_id, filename=self.model_ckpt)
 
+            # 2. Configuration de l'architecture du modèle DiT (Diffusion Transformer)
+            # Ces paramètres doivent correspondre à ceux utilisés lors de l'entraînement
+            # attn_mask_enabled : le masque d'attention est appliqué (désactivé par défaut dans F5 1.1.x),
+            # nécessaire au mode compilé pour exclure les frames ajoutées jusqu'au bucket
+            model_cfg = dict(dim=1024, depth=22, heads=16, ff_mult=2, text_dim=512, conv_layers=4,
+                             attn_mask_enabled=True)
+
+            # 3. Chargement du modèle principal (DiT)
+            logger.info(f"Loading DiT model on {self.device}...")
+            model = load_model(
+                model_cls=DiT,
+                model_cfg=model_cfg,
+                ckpt_path=ckpt_path,
+                device=self.device,
+                mel_spec_type="vocos"
+            )
+
+            # OPTIMIZATION: Use FP16 on GPU to save VRAM (Critical for 4GB cards like GTX 1650)
+            if self.device == "cuda":
+                logger.info("Switching to FP16 (Half Precision) for VRAM optimization...")
+                model = model.half()
+            else:
+                model = model.float()
+
+            # Mode compilé (opt-in, TTS_COMPILE=1) : réduit le coût Python/dispatch par step
+            if TTS_COMPILE:
+                model = compile_dit(model)
+
+            logger.success(f"F5-TTS DiT ready for voice cloning. CUDA: {torch.cuda.is_available()}")
+            return model
+        except Exception as e:
+            logger.critical(f"TTS Initialization failed: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            raise
+
+    def _load_vocoder(self):
+        """
+        Chargement du Vocodeur (Vocos) séparément.
+        Le vocodeur transforme les spectrogrammes générés par le DiT en forme d'onde audio.
+        """
+        logger.info("Loading Vocoder (Vocos)...")
+        vocoder = load_vocoder(vocoder_name="vocos", device=self.device)
+        if TTS_COMPILE:
+            vocoder = compile_vocoder(vocoder)
+        return vocoder
 
     def _clean_text(self, text: str) -> str:
         """
@@ -117,23 +137,11 @@ class TTSService:
             logger.error(f"Basic TTS Failure: {e}")
             return None
 
-    def synthesize(self, text: str, output_path: str, ref_audio_path: str = None, ref_text: str = "", use_standard: bool = False):
+    def _resolve_reference(self, ref_audio_path: str, ref_text: str, use_standard: bool):
         """
-        Synthèse avancée utilisant F5-TTS pour le clonage de voix.
-        
-        Args:
-            text: Le texte à synthétiser.
-            output_path: Où sauvegarder le fichier wav généré.
-            ref_audio_path: Chemin vers l'audio de référence (la voix à cloner).
-            ref_text: Transcription de l'audio de référence (pour guider le modèle).
-            use_standard: Si True, utilise une voix standard pré-enregistrée au lieu du clonage.
+        Détermine l'audio et le texte de référence à utiliser pour le clonage.
+        Renvoie (ref_audio, ref_text, use_standard) ; ref_audio vaut None si aucune référence n'est disponible.
         """
-        self._ensure_model_loaded()
-        
-        # 1. Nettoyage du texte cible
-        text = self._clean_text(text)
-        
-        # 2. Détermination de l'audio et du texte de référence
         final_ref_audio = ref_audio_path
         final_ref_text = ref_text
         
@@ -171,7 +179,7 @@ class TTSService:
         # Si toujours aucune référence audio, on ne peut pas cloner -> Erreur
         if not final_ref_audio or not os.path.exists(final_ref_audio):
              logger.error("TRANS-FATAL: No reference audio available.")
-             return None
+             return None, None, use_standard
 
         # Validation stricte de la référence
         final_ref_text = self._clean_text(final_ref_text)
@@ -185,18 +193,119 @@ class TTSService:
             if not final_ref_text:
                 raise ValueError("Reference text (transcription of the voice) is missing. F5-TTS requires it for stability.")
 
-        # Paramètres d'inférence
-        # speed: Vitesse de la parole (0.9 est plus posé et clair)
-        speed = 0.9
-        # nfe: Steps de génération. 32 = Rapide, 64 = Haute Qualité.
-        # On passe à 64 pour améliorer la clarté suite aux retours utilisateurs.
-        nfe = 64
+        return final_ref_audio, final_ref_text, use_standard
 
+    def synthesize(self, text: str, output_path: str, ref_audio_path: str = None, ref_text: str = "", use_standard: bool = False,
+                   nfe: int = None):
+        """
+        Synthèse avancée utilisant F5-TTS pour le clonage de voix.
+        
+        Args:
+            text: Le texte à synthétiser.
+            output_path: Où sauvegarder le fichier wav généré.
+            ref_audio_path: Chemin vers l'audio de référence (la voix à cloner).
+            ref_text: Transcription de l'audio de référence (pour guider le modèle).
+            use_standard: Si True, utilise une voix standard pré-enregistrée au lieu du clonage.
+            nfe: Nombre de steps (réglage par voix issu du tuning), sinon `default_nfe`.
+        """
+        # 1. Nettoyage du texte cible
+        text = self._clean_text(text)
+        
+        # 2. Détermination de l'audio et du texte de référence
+        final_ref_audio, final_ref_text, use_standard = self._resolve_reference(ref_audio_path, ref_text, use_standard)
+        if not final_ref_audio:
+            return None
+
+        # Les modèles restent "en cours d'utilisation" (non évinçables) pendant l'inférence
+        with model_registry.acquire("f5_dit") as model, model_registry.acquire("vocos") as vocoder:
+            return self._run_inference(model, vocoder, text, output_path, final_ref_audio, final_ref_text,
+                                       use_standard, self.default_speed, nfe or self.default_nfe)
+
+    def _load_reference(self, ref_audio_path: str):
+        """
+        Charge et prépare l'audio de référence une seule fois, comme infer_batch_process de F5-TTS :
+        mono, RMS remonté à `target_rms`, rééchantillonné à 24 kHz, sur le device.
+        Renvoie (audio, rms d'origine), réutilisable pour plusieurs synthèses (lots).
+        """
+        audio, sr = torchaudio.load(ref_audio_path)
+        if audio.shape[0] > 1:
+            audio = torch.mean(audio, dim=0, keepdim=True)
+        rms = torch.sqrt(torch.mean(torch.square(audio))).item()
+        if 0 < rms < f5_infer.target_rms:
+            audio = audio * f5_infer.target_rms / rms
+        if sr != f5_infer.target_sample_rate:
+            audio = torchaudio.transforms.Resample(sr, f5_infer.target_sample_rate)(audio)
+        return audio.to(self.device), rms
+
+    def _infer(self, model, vocoder, text, reference, ref_text, speed, nfe):
+        """
+        Équivalent de `infer_process` / `infer_batch_process` de F5-TTS (mêmes paramètres par défaut),
+        exécuté entièrement dans le thread appelant : F5 lance l'échantillonnage du DiT et le vocodeur
+        dans un ThreadPoolExecutor, où torch.profiler (enregistré par thread) ne voit aucun opérateur.
+        Renvoie (forme d'onde, fréquence, None).
+        """
+        audio, rms = reference
+        sample_rate, hop_length = f5_infer.target_sample_rate, f5_infer.hop_length
+        ref_seconds = audio.shape[-1] / sample_rate
+        max_chars = int(len(ref_text.encode("utf-8")) / ref_seconds * (22 - ref_seconds) * speed)
+        if len(ref_text[-1].encode("utf-8")) == 1:
+            ref_text = ref_text + " "
+        ref_audio_len = audio.shape[-1] // hop_length
+        ref_text_len = len(ref_text.encode("utf-8"))
+
+        waves = []
+        for gen_text in chunk_text(text, max_chars=max_chars):
+            gen_text_len = len(gen_text.encode("utf-8"))
+            local_speed = 0.3 if gen_text_len < 10 else speed
+            duration = ref_audio_len + int(ref_audio_len / ref_text_len * gen_text_len / local_speed)
+
+            with torch.inference_mode():
+                with record_function("f5.dit_sample"):
+                    generated, _ = model.sample(
+                        cond=audio,
+                        text=convert_char_to_pinyin([ref_text + gen_text]),
+                        duration=duration,
+                        steps=nfe,
+                        cfg_strength=f5_infer.cfg_strength,
+                        sway_sampling_coef=f5_infer.sway_sampling_coef,
+                    )
+                mel = generated.to(torch.float32)[:, ref_audio_len:, :].permute(0, 2, 1)
+                with record_function("f5.vocoder_decode"):
+                    wave = vocoder.decode(mel)
+                if rms < f5_infer.target_rms:
+                    wave = wave * rms / f5_infer.target_rms
+            waves.append(wave.squeeze().cpu().numpy())
+
+        if not waves:
+            raise ValueError("Nothing to synthesize")
+        return self._cross_fade(waves, sample_rate), sample_rate, None
+
+    @staticmethod
+    def _cross_fade(waves: list, sample_rate: int):
+        """
+        Assemble les morceaux générés avec un fondu enchaîné (`cross_fade_duration` de F5-TTS).
+        """
+        final = waves[0]
+        for wave in waves[1:]:
+            n = min(int(f5_infer.cross_fade_duration * sample_rate), len(final), len(wave))
+            if n <= 0:
+                final = np.concatenate([final, wave])
+                continue
+            overlap = final[-n:] * np.linspace(1, 0, n) + wave[:n] * np.linspace(0, 1, n)
+            final = np.concatenate([final[:-n], overlap, wave[n:]])
+        return final
+
+    def _run_inference(self, model, vocoder, text, output_path, final_ref_audio, final_ref_text,
+                       use_standard, speed, nfe):
+        """
+        Exécute l'inférence F5-TTS avec les modèles fournis par le registre.
+        `final_ref_audio` est un chemin, ou une référence déjà préparée (`_load_reference`) partagée par un lot.
+        """
         logger.info(f"Synthesizing | Mode: {'Standard' if use_standard else 'Clone'}")
         
         # DEBUG GPU VERIFICATION
         try:
-            param = next(self.model.parameters())
+            param = next(model.parameters())
             logger.info(f"DEVICE CHECK | Model is on: {param.device} | Type: {param.dtype}")
             if "cuda" not in str(param.device):
                 logger.warning("⚠️ MODEL IS NOT ON CUDA! SLOW GENERATION EXPECTED.")
@@ -212,16 +321,12 @@ class TTSService:
         
         try:
             # Appel au processus d'inférence de F5-TTS
-            audio, sr, _ = infer_process(
-                ref_audio=final_ref_audio, 
-                ref_text=final_ref_text, 
-                gen_text=text, 
-                model_obj=self.model, 
-                vocoder=self.vocoder,
-                device=self.device,
-                speed=speed,
-                nfe_step=nfe
-            )
+            # (les régions nommées n'ont un coût que si un profilage est actif)
+            reference = final_ref_audio
+            if isinstance(reference, str):
+                reference = self._load_reference(reference)
+            with record_function("f5.infer_process"):
+                audio, sr, _ = self._infer(model, vocoder, text, reference, final_ref_text, speed, nfe)
             
             # Conversion du résultat en tenseur si nécessaire
             if not torch.is_tensor(audio):
@@ -244,13 +349,80 @@ class TTSService:
             # -----------------------
 
             # Sauvegarde du fichier audio généré
-            torchaudio.save(output_path, audio, sr)
+            with record_function("f5.save_wav"):
+                torchaudio.save(output_path, audio, sr)
             return output_path
         except Exception as e:
             logger.exception(f"Synthesis Engine Failure: {str(e)}")
             raise
 
 
+    def synthesize_batch(self, engine: str, texts: list, output_dir: str, ref_audio_path: str = None,
+                         ref_text: str = "", use_standard: bool = False, on_progress=None, nfe: int = None) -> list:
+        """
+        Synthèse d'une liste de textes avec une seule voix (scripts, paragraphes, menus IVR).
+
+        La référence est résolue et chargée une seule fois (audio partagé par tous les éléments)
+        et les modèles restent acquis pendant tout le lot (pas de rechargement ni de passage
+        par la file entre les éléments).
+        `on_progress(done, total, path)` est appelé après chaque élément.
+        Renvoie la liste des chemins générés (None pour un élément en échec).
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        total = len(texts)
+        paths = []
+
+        if engine == "basic":
+            for i, text in enumerate(texts):
+                path = self.synthesize_basic(text, os.path.join(output_dir, f"{i + 1:04d}.mp3"))
+                paths.append(path)
+                if on_progress:
+                    on_progress(i + 1, total, path)
+            return paths
+
+        final_ref_audio, final_ref_text, use_standard = self._resolve_reference(ref_audio_path, ref_text, use_standard)
+        if not final_ref_audio:
+            return [None] * total
+        reference = self._load_reference(final_ref_audio)
+
+        with model_registry.acquire("f5_dit") as model, model_registry.acquire("vocos") as vocoder:
+            for i, text in enumerate(texts):
+                output_path = os.path.join(output_dir, f"{i + 1:04d}.wav")
+                try:
+                    path = self._run_inference(model, vocoder, self._clean_text(text), output_path,
+                                               reference, final_ref_text, use_standard,
+                                               self.default_speed, nfe or self.default_nfe)
+                except Exception as e:
+                    # Un élément en échec ne doit pas faire perdre tout le lot
+                    logger.error(f"Batch Synthesis | Item {i + 1}/{total} failed: {e}")
+                    path = None
+                paths.append(path)
+                if on_progress:
+                    on_progress(i + 1, total, path)
+        return paths
+
+    def concatenate(self, paths: list, output_path: str, gap_seconds: float = 0.4) -> str:
+        """
+        Concatène plusieurs fichiers audio en une seule piste, séparés par un court silence.
+        """
+        tracks = []
+        target_sr = None
+        for path in paths:
+            audio, sr = torchaudio.load(path)
+            audio = audio.mean(dim=0, keepdim=True)
+            if target_sr is None:
+                target_sr = sr
+            elif sr != target_sr:
+                audio = torchaudio.functional.resample(audio, sr, target_sr)
+            if tracks and gap_seconds > 0:
+                tracks.append(torch.zeros(1, int(gap_seconds * target_sr)))
+            tracks.append(audio)
+
+        if not tracks:
+            return None
+        torchaudio.save(output_path, torch.cat(tracks, dim=1), target_sr)
+        return output_path
+
     def synthesize_with_engine(self, engine: str, text: str, output_path: str, **kwargs):
         """
         Point d'entrée universel pour choisir le moteur de synthèse.
@@ -270,7 +442,8 @@ class TTSService:
                 output_path, 
                 ref_audio_path=kwargs.get("ref_audio_path"),
                 ref_text=kwargs.get("ref_text", ""),
-                use_standard=kwargs.get("use_standard", False)
+                use_standard=kwargs.get("use_standard", False),
+                nfe=kwargs.get("nfe")
             )
 
 tts_service = TTSService()
@@ -0,0 +1,121 @@
+import os
+import re
+import sqlite3
+import unicodedata
+
+import torch
+from loguru import logger
+
+from services import stt
+from services.tts import tts_service
+
+# Phrases de test : ponctuation, nombres écrits, liaisons et sons proches (p/b, s/ch, an/on)
+PROBE_TEXTS = [
+    "Bonjour, je vous appelle au sujet de votre rendez-vous de jeudi.",
+    "Les chaussettes de l'archiduchesse sont-elles sèches ou archisèches ?",
+    "Pour confirmer votre commande, appuyez sur la touche étoile puis dièse.",
+    "Un grand bateau blanc attendait au bout du ponton, sous la pluie.",
+]
+
+# NFE testés, du plus cher au moins cher
+TUNING_NFE_CANDIDATES = [int(n) for n in os.getenv("TUNING_NFE_CANDIDATES", "64,48,32,24,16").split(",")]
+# Dégradation maximale tolérée du WER par rapport au NFE le plus élevé (critère principal)
+TUNING_MAX_DEGRADATION = float(os.getenv("TUNING_MAX_DEGRADATION", "0.05"))
+# WER moyen maximal absolu (0 = désactivé) : Whisper "base" bute déjà sur certaines
+# phrases de test au NFE le plus élevé, un seuil absolu rejetterait la plupart des voix.
+TUNING_MAX_WER = float(os.getenv("TUNING_MAX_WER", "0"))
+# Graine fixe par phrase de test : chaque NFE part du même bruit initial
+TUNING_SEED = int(os.getenv("TUNING_SEED", "1234"))
+
+
+def normalize_words(text: str) -> list[str]:
+    """
+    Mots en minuscules, sans ponctuation, pour comparer texte d'entrée et transcription.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = re.sub(r"[^\w\s']", " ", text).replace("'", "' ")
+    return text.split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    WER = distance d'édition (mots) / nombre de mots de la référence.
+    """
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(
+                previous[j] + 1,          # suppression
+                current[j - 1] + 1,       # insertion
+                previous[j - 1] + (ref_word != hyp_word),  # substitution
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def score_nfe(nfe: int, ref_audio_path: str, ref_text: str, workdir: str) -> float:
+    """
+    Synthétise les phrases de test au NFE donné et renvoie leur WER moyen.
+    Chaque phrase est générée avec la même graine quel que soit le NFE, et transcrite
+    sans échantillonnage (temperature=0) : les écarts entre NFE ne sont pas du bruit de tirage.
+    """
+    wers = []
+    for i, text in enumerate(PROBE_TEXTS):
+        output_path = os.path.join(workdir, f"probe_{nfe}_{i}.wav")
+        torch.manual_seed(TUNING_SEED + i)
+        path = tts_service.synthesize(text, output_path, ref_audio_path=ref_audio_path, ref_text=ref_text, nfe=nfe)
+        if not path:
+            wers.append(1.0)
+            continue
+        hypothesis = stt.transcribe(path, temperature=0.0)["text"]
+        wers.append(word_error_rate(text, hypothesis))
+        os.remove(path)
+    return sum(wers) / len(wers)
+
+
+def tune_voice(ref_audio_path: str, ref_text: str, workdir: str, on_progress=None) -> dict:
+    """
+    Cherche le NFE le moins cher qui reste intelligible pour une voix.
+
+    Les candidats sont testés par NFE décroissant ; le premier (le plus cher) sert de référence.
+    Un NFE est accepté si son WER moyen ne se dégrade pas de plus de TUNING_MAX_DEGRADATION
+    par rapport à cette référence (et reste sous TUNING_MAX_WER si ce seuil est activé).
+    On s'arrête au premier échec (la qualité baisse avec le NFE).
+    Si même le premier candidat échoue, on garde le NFE par défaut.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    candidates = sorted(TUNING_NFE_CANDIDATES, reverse=True)
+    results = []
+    best_nfe = tts_service.default_nfe
+    baseline = None
+
+    for index, nfe in enumerate(candidates):
+        wer = score_nfe(nfe, ref_audio_path, ref_text, workdir)
+        if baseline is None:
+            baseline = wer
+        passed = wer - baseline <= TUNING_MAX_DEGRADATION and (not TUNING_MAX_WER or wer <= TUNING_MAX_WER)
+        results.append({"nfe": nfe, "wer": round(wer, 4), "passed": passed})
+        logger.info(f"Voice Tuning | NFE {nfe}: WER {wer:.3f} ({'ok' if passed else 'rejected'})")
+        if on_progress:
+            on_progress(index + 1, len(candidates), nfe, wer)
+        if not passed:
+            break
+        best_nfe = nfe
+
+    return {"nfe": best_nfe, "baseline_wer": round(baseline, 4), "candidates": results}
+
+
+def save_voice_tuning(db_path: str, voice_id: str, nfe: int):
+    """
+    Enregistre le NFE retenu sur le profil vocal (utilisé par défaut par /synthesize).
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('UPDATE voice_profiles SET nfe = ?, tuned_at = CURRENT_TIMESTAMP WHERE id = ?', (nfe, voice_id))
+    conn.commit()
+    conn.close()
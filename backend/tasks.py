@@ -1,15 +1,23 @@
 import os
+import threading
 import time
-from celery_app import celery
+import zipfile
+from celery.signals import worker_ready
+from celery_app import celery, publish_worker_status, WORKER_STATUS_INTERVAL
 from services.tts import tts_service
+from services.model_registry import model_registry
+from services.profiling import profile_trace
+from services.tuning import tune_voice, save_voice_tuning
 from loguru import logger
 
 @celery.task(bind=True)
-def synthesize_task(self, engine, text, output_path, ref_audio_path, ref_text, use_standard):
+def synthesize_task(self, engine, text, output_path, ref_audio_path, ref_text, use_standard, profile=False, nfe=None):
     """
     Tâche Celery pour exécuter la synthèse vocale en arrière-plan.
+    Si `profile` est vrai, la synthèse est capturée dans une trace Chrome (identifiant = id de la tâche).
     """
     logger.info(f"Celery Task | Starting {engine} synthesis...")
+    started = time.perf_counter()
     
     # Callback pour envoyer des mises à jour de statut (simulé via Celery state)
     # L'API FastAPI pourra lire cet état ou on pourra utiliser Redis directement.
@@ -20,18 +28,24 @@ def synthesize_task(self, engine, text, output_path, ref_audio_path, ref_text, u
              self.update_state(state='PROGRESS', meta={'status': 'Préparation du modèle IA...'})
 
         # Appel au service TTS (identique à l'ancien code mais dans un worker)
-        path = tts_service.synthesize_with_engine(
-            engine=engine,
-            text=text,
-            output_path=output_path,
-            ref_audio_path=ref_audio_path,
-            ref_text=ref_text,
-            use_standard=use_standard
-        )
+        with profile_trace(self.request.id, enabled=profile) as trace:
+            path = tts_service.synthesize_with_engine(
+                engine=engine,
+                text=text,
+                output_path=output_path,
+                ref_audio_path=ref_audio_path,
+                ref_text=ref_text,
+                use_standard=use_standard,
+                nfe=nfe
+            )
         
         if path and os.path.exists(path):
             logger.success(f"Celery Task | Success: {path}")
-            return {'status': 'Terminé', 'path': path}
+            # Temps d'exécution côté worker (hors attente en file) : sert à l'estimation d'attente de l'API
+            result = {'status': 'Terminé', 'path': path, 'runtime': time.perf_counter() - started}
+            if trace.path:
+                result['profile_id'] = trace.profile_id
+            return result
         else:
             logger.error(f"Celery Task | {engine} failed")
             return {'status': 'Erreur', 'error': 'Synthesis failed'}
@@ -39,3 +53,107 @@ def synthesize_task(self, engine, text, output_path, ref_audio_path, ref_text, u
     except Exception as e:
         logger.error(f"Celery Task | Critical Failure: {e}")
         return {'status': 'Erreur', 'error': str(e)}
+
+
+@celery.task(bind=True)
+def bulk_synthesize_task(self, engine, texts, output_dir, ref_audio_path, ref_text, use_standard, output_format="zip", nfe=None):
+    """
+    Tâche Celery de synthèse en lot : tous les textes sont traités dans un seul job,
+    avec une seule voix. La progression est publiée élément par élément.
+    Le résultat est un ZIP des fichiers individuels ou une piste concaténée.
+    """
+    total = len(texts)
+    logger.info(f"Celery Bulk | Starting {engine} synthesis of {total} items...")
+    started = time.perf_counter()
+    self.update_state(state='PROGRESS', meta={'status': f'Démarrage du lot ({total} éléments)', 'done': 0, 'total': total, 'failed': 0})
+
+    failed = []
+
+    def on_progress(done, total, path):
+        if not path:
+            failed.append(done)
+        self.update_state(state='PROGRESS', meta={
+            'status': f'Synthèse {done}/{total}',
+            'done': done,
+            'total': total,
+            'failed': len(failed),
+        })
+
+    try:
+        paths = tts_service.synthesize_batch(
+            engine, texts, output_dir,
+            ref_audio_path=ref_audio_path,
+            ref_text=ref_text,
+            use_standard=use_standard,
+            on_progress=on_progress,
+            nfe=nfe
+        )
+        produced = [p for p in paths if p and os.path.exists(p)]
+        if not produced:
+            logger.error("Celery Bulk | No item could be synthesized")
+            return {'status': 'Erreur', 'error': 'Synthesis failed for every item'}
+
+        self.update_state(state='PROGRESS', meta={'status': 'Assemblage du résultat...', 'done': total, 'total': total, 'failed': len(failed)})
+        if output_format == "concat":
+            result_path = tts_service.concatenate(produced, os.path.join(output_dir, "bulk.wav"))
+        else:
+            result_path = os.path.join(output_dir, "bulk.zip")
+            with zipfile.ZipFile(result_path, "w", zipfile.ZIP_DEFLATED) as archive:
+                for path in produced:
+                    archive.write(path, os.path.basename(path))
+
+        logger.success(f"Celery Bulk | Success: {result_path} ({len(produced)}/{total} items)")
+        return {'status': 'Terminé', 'path': result_path, 'total': total, 'failed': failed,
+                'runtime': time.perf_counter() - started}
+
+    except Exception as e:
+        logger.error(f"Celery Bulk | Critical Failure: {e}")
+        return {'status': 'Erreur', 'error': str(e)}
+
+@celery.task(bind=True)
+def tune_voice_task(self, voice_id, ref_audio_path, ref_text, db_path, workdir):
+    """
+    Tâche Celery de tuning NFE d'un profil vocal : synthèse des phrases de test à NFE
+    décroissant, score WER via Whisper, puis enregistrement du NFE retenu sur le profil.
+    """
+    logger.info(f"Celery Tuning | Starting NFE tuning for voice {voice_id}...")
+    started = time.perf_counter()
+    self.update_state(state='PROGRESS', meta={'status': 'Démarrage du tuning', 'done': 0})
+
+    def on_progress(done, total, nfe, wer):
+        self.update_state(state='PROGRESS', meta={
+            'status': f'NFE {nfe} : WER {wer:.2f}',
+            'done': done,
+            'total': total,
+        })
+
+    try:
+        report = tune_voice(ref_audio_path, ref_text, workdir, on_progress=on_progress)
+        save_voice_tuning(db_path, voice_id, report['nfe'])
+        logger.success(f"Celery Tuning | Voice {voice_id} -> NFE {report['nfe']}")
+        return {'status': 'Terminé', 'voice_id': voice_id, **report, 'runtime': time.perf_counter() - started}
+    except Exception as e:
+        logger.error(f"Celery Tuning | Critical Failure: {e}")
+        return {'status': 'Erreur', 'error': str(e)}
+
+def publish_models_status():
+    try:
+        publish_worker_status(model_registry.snapshot())
+    except Exception as e:
+        logger.warning(f"Celery Worker | Could not publish models status: {e}")
+
+@worker_ready.connect
+def start_models_status_publisher(**kwargs):
+    """
+    Publie l'état du registre de modèles du worker (lu par GET /models) à chaque
+    chargement/déchargement et périodiquement, sans passer par la file des tâches
+    (le worker -P solo ne répondrait pas pendant une synthèse).
+    """
+    model_registry.add_listener(publish_models_status)
+
+    def _loop():
+        while True:
+            publish_models_status()
+            time.sleep(WORKER_STATUS_INTERVAL)
+
+    threading.Thread(target=_loop, name="models-status-publisher", daemon=True).start()